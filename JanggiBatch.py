@@ -0,0 +1,194 @@
+# Description: Tools for scoring many Janggi positions at once. Boards from JanggiGame are exported to a single NumPy
+# array, one 10x9 grid per position, and the functions below score the whole array with NumPy operations instead of
+# looking at one Board at a time - for ranking candidate moves, building training data or analyzing game archives.
+# This module needs NumPy; JanggiGame itself doesn't.
+
+import numpy as np
+
+from JanggiGame import (COLUMNS, PIECE_CLASSES, PIECE_VALUES, RED, GENERAL, GUARD, ELEPHANT, HORSE, CHARIOT, CANNON,
+                        SOLDIER)
+
+
+# Each position is a 10x9 grid of int8 values, indexed [row][column] in the order of the tile names - grid[0][0] is
+# "a1", grid[0][8] is "i1" and grid[9][8] is "i10". A blue piece is stored as its type (GENERAL, GUARD, ... SOLDIER,
+# so PIECE_CLASSES[value] is its class), a red piece as minus its type, and an empty tile as 0.
+ROWS = 10
+
+# Turns the Board's piece codes (see Board.get_squares) into the values above - the red codes are the type plus RED
+CODE_TO_VALUE = np.zeros(RED + SOLDIER + 1, dtype=np.int8)
+for piece_type in range(GENERAL, SOLDIER + 1):
+    CODE_TO_VALUE[piece_type] = piece_type
+    CODE_TO_VALUE[piece_type + RED] = -piece_type
+
+# The material value of each piece type, indexed by the absolute grid value - as PIECE_VALUES, with nothing for the
+# general, which is always on the board
+MATERIAL_VALUES = np.array(PIECE_VALUES[:RED], dtype=np.int32)
+
+# How much each point of the mobility proxy (see mobility) is worth in evaluate, next to material and piece placement
+MOBILITY_WEIGHT = 5
+
+
+def make_piece_square_tables():
+    """
+    Builds the piece-square tables - a bonus for each type of piece on each tile, from blue's point of view (blue
+    moves towards row 1, so a red piece's bonus is read from the table turned upside down). Only used to build the
+    PIECE_SQUARE_TABLES array below.
+    :return: an int32 array of shape (8, 10, 9), indexed by piece type and then by tile
+    """
+    tables = np.zeros((RED, ROWS, len(COLUMNS)), dtype=np.int32)
+    rows = np.arange(ROWS).reshape(ROWS, 1)
+    columns = np.arange(len(COLUMNS)).reshape(1, len(COLUMNS))
+
+    # distance from the middle of the board, in rows and columns
+    row_distance = np.abs(2 * rows - (ROWS - 1)) // 2
+    column_distance = np.abs(columns - len(COLUMNS) // 2)
+
+    # soldiers gain as they advance (blue soldiers start on row 7), and more again for reaching the enemy palace,
+    # where they threaten the general; a soldier on the last row can only move sideways
+    advance = np.clip(6 - rows, 0, None)
+    tables[SOLDIER] = 10 * advance - 5 * column_distance * (advance > 0)
+    tables[SOLDIER][0:3, 3:6] += 30
+    tables[SOLDIER][0] -= 20
+
+    # horses and cannons are better in the middle of the board, where they reach more tiles
+    tables[HORSE] = 20 - 5 * column_distance - 3 * row_distance
+    tables[CANNON] = 10 - 3 * column_distance
+    tables[ELEPHANT] = 10 - 2 * column_distance - 2 * row_distance
+
+    # chariots are worth a little more on the open files near the middle, and the general is safest at the
+    # centre of its palace
+    tables[CHARIOT] = 10 - 2 * column_distance
+    tables[GENERAL][8, 4] = 20
+    tables[GUARD][7:10, 3:6] = 5
+    return tables
+
+
+PIECE_SQUARE_TABLES = make_piece_square_tables()
+
+
+def encode_boards(boards):
+    """
+    Exports Board objects to one array of positions. Every Board's flat list of piece codes is copied into a single
+    buffer and converted in one step, so the cost per Board is little more than reading its tiles.
+    :param boards: an iterable of Board objects (e.g. from JanggiGame.get_board)
+    :return: a C-contiguous int8 array of shape (N, 10, 9), as described at ROWS
+    """
+    codes = np.frombuffer(b''.join(board.get_position_bytes() for board in boards), dtype=np.uint8)
+    return np.ascontiguousarray(CODE_TO_VALUE[codes].reshape(-1, ROWS, len(COLUMNS)))
+
+
+def encode_games(games):
+    """
+    Exports the boards of JanggiGame objects to one array of positions - see encode_boards
+    :param games: an iterable of JanggiGame objects
+    :return: a C-contiguous int8 array of shape (N, 10, 9)
+    """
+    return encode_boards(game.get_board() for game in games)
+
+
+def piece_at(positions, index, square):
+    """
+    Looks up the piece on a tile of one position in an array of positions
+    :param positions: an array of positions, as returned by encode_boards
+    :param index: which position in the array to look at
+    :param square: the tile, e.g. "e9"
+    :return: a tuple of the piece's class (e.g. Chariot) and its color, or None if the tile is empty
+    """
+    value = int(positions[index, int(square[1:]) - 1, COLUMNS.index(square[0])])
+    if value == 0:
+        return None
+    return PIECE_CLASSES[abs(value)], 'blue' if value > 0 else 'red'
+
+
+def material(positions):
+    """
+    Scores the material of each position - the sum of PIECE_VALUES of blue's pieces less red's
+    :param positions: an array of positions, as returned by encode_boards
+    :return: an int32 array of N scores, from blue's point of view
+    """
+    values = MATERIAL_VALUES[np.abs(positions)]
+    return np.where(positions > 0, values, -values).sum(axis=(1, 2), dtype=np.int32)
+
+
+def piece_square(positions, tables=PIECE_SQUARE_TABLES):
+    """
+    Scores where each position's pieces stand, using a piece-square table for each type of piece
+    :param positions: an array of positions, as returned by encode_boards
+    :param tables: an array of shape (8, 10, 9) of bonuses from blue's point of view, indexed by piece type and then by
+    tile - by default PIECE_SQUARE_TABLES
+    :return: an int32 array of N scores, from blue's point of view
+    """
+    # a red piece's bonus comes from the same table turned upside down, since red moves the other way
+    types = np.abs(positions)
+    columns = np.arange(len(COLUMNS))
+    blue_bonus = tables[types, np.arange(ROWS)[:, None], columns]
+    red_bonus = tables[types, np.arange(ROWS - 1, -1, -1)[:, None], columns]
+    scores = np.where(positions > 0, blue_bonus, 0) - np.where(positions < 0, red_bonus, 0)
+    return scores.sum(axis=(1, 2), dtype=np.int32)
+
+
+def empty_runs(empty, axis, reverse):
+    """
+    Counts, for every tile of every position, how many empty tiles follow it in a line - the tiles a chariot on it
+    could slide to along that line before reaching another piece or the edge of the board. The line is worked along
+    one row or column at a time, each step covering the whole array.
+    :param empty: a boolean array of shape (N, 10, 9), True on the empty tiles
+    :param axis: 1 to count along columns (up and down the board), 2 to count along rows
+    :param reverse: False to count towards higher rows or columns, True to count towards lower ones
+    :return: an int8 array of shape (N, 10, 9)
+    """
+    runs = np.zeros(empty.shape, dtype=np.int8)
+    length = empty.shape[axis]
+
+    # the run from the last line in the direction of counting is always 0, so the counting starts one line before
+    # it and works backwards - the run from a tile is the next tile, if it's empty, plus the run from that tile
+    order = range(1, length) if reverse else range(length - 2, -1, -1)
+    for line in order:
+        current = [slice(None)] * 3
+        following = [slice(None)] * 3
+        current[axis] = line
+        following[axis] = line - 1 if reverse else line + 1
+        runs[tuple(current)] = empty[tuple(following)] * (1 + runs[tuple(following)])
+    return runs
+
+
+def mobility(positions):
+    """
+    Scores a simple stand-in for how freely each position's pieces can move, without generating any moves: the
+    number of empty tiles along the open lines of each chariot, and the number of unblocked first steps of each horse
+    and elephant. Palace diagonals, captures and cannons are left out, so this is only a proxy for the real number of
+    moves.
+    :param positions: an array of positions, as returned by encode_boards
+    :return: an int32 array of N scores - the proxy for blue less the proxy for red - from blue's point of view
+    """
+    empty = positions == 0
+    sides = np.sign(positions).astype(np.int32)
+
+    # tiles a chariot could slide to in each of the four directions
+    lines = sum(empty_runs(empty, axis, reverse).astype(np.int32) for axis in (1, 2) for reverse in (False, True))
+    chariots = np.abs(positions) == CHARIOT
+    score = (np.where(chariots, lines, 0) * sides).sum(axis=(1, 2))
+
+    # a horse or elephant is blocked in each direction whose first, orthogonal, tile holds a piece
+    neighbours = np.zeros(positions.shape, dtype=np.int32)
+    neighbours[:, 1:, :] += empty[:, :-1, :]
+    neighbours[:, :-1, :] += empty[:, 1:, :]
+    neighbours[:, :, 1:] += empty[:, :, :-1]
+    neighbours[:, :, :-1] += empty[:, :, 1:]
+    mammals = (np.abs(positions) == HORSE) | (np.abs(positions) == ELEPHANT)
+    score += (np.where(mammals, neighbours, 0) * sides).sum(axis=(1, 2))
+    return score.astype(np.int32)
+
+
+def evaluate(positions, turns=None):
+    """
+    Scores every position by material, piece placement and mobility together
+    :param positions: an array of positions, as returned by encode_boards
+    :param turns: optionally, a sequence of N colors ("blue" or "red") - the player each position should be scored
+    for, as with Search.evaluate. By default, every position is scored from blue's point of view.
+    :return: an int32 array of N scores
+    """
+    scores = material(positions) + piece_square(positions) + MOBILITY_WEIGHT * mobility(positions)
+    if turns is not None:
+        scores = np.where(np.asarray(turns) == 'red', -scores, scores)
+    return scores.astype(np.int32)
@@ -5,7 +5,362 @@
 # a game, using the classic moves for the game. This version of the game does not
 # account for ties.
 
-import copy
+import argparse
+import mmap
+import os
+import random
+import struct
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+
+# The 90 tiles of the board, numbered 0-89 row by row - "a1" is 0, "i1" is 8, "a2" is 9 and so on up to "i10", which
+# is 89. Tile names are only needed where positions come in or go out in algebraic notation; everything else about
+# the board's geometry is worked out once, below, when the module is imported.
+COLUMNS = 'abcdefghi'
+SQUARES = tuple(column + str(row) for row in range(1, 11) for column in COLUMNS)
+SQUARE_INDEX = {square: index for index, square in enumerate(SQUARES)}
+
+# Pieces are stored on the Board's flat array of tiles as small integer codes - the piece type, plus RED for the
+# red player's pieces. An empty tile holds EMPTY.
+EMPTY = 0
+GENERAL, GUARD, ELEPHANT, HORSE, CHARIOT, CANNON, SOLDIER = range(1, 8)
+RED = 8
+
+OPPONENT = {'blue': 'red', 'red': 'blue'}
+
+
+def shift_square(square, columns, rows):
+    """
+    Finds the tile a given number of columns and rows away from a starting tile. Only used to build the lookup
+    tables below.
+    :param square: the starting tile, e.g. "e2"
+    :param columns: the number of columns to move - negative to move towards column "a"
+    :param rows: the number of rows to move - negative to move towards row 1
+    :return: the tile that was reached, or None if it would be off the board
+    """
+    column = SQUARE_INDEX[square] % 9 + columns
+    row = SQUARE_INDEX[square] // 9 + rows
+    if 0 <= column < 9 and 0 <= row < 10:
+        return SQUARES[row * 9 + column]
+    return None
+
+
+# The four orthogonal neighbours of each tile, in the order (left, right, down, up); None where the neighbour would
+# be off the board
+ORTHOGONALS = {
+    square: (shift_square(square, -1, 0), shift_square(square, 1, 0), shift_square(square, 0, -1),
+             shift_square(square, 0, 1))
+    for square in SQUARES
+}
+
+
+def make_ray(square, columns, rows):
+    """
+    Walks from a tile in one direction until the edge of the board. Only used to build the lookup tables below.
+    :param square: the starting tile, which is not part of the ray
+    :param columns: the change in column on each step
+    :param rows: the change in row on each step
+    :return: a tuple of the tiles passed through, ordered outwards from the starting tile
+    """
+    ray = []
+    square = shift_square(square, columns, rows)
+    while square is not None:
+        ray.append(square)
+        square = shift_square(square, columns, rows)
+    return tuple(ray)
+
+
+# The lines a chariot or cannon can slide along from each tile, ordered outwards from the tile - (up, down, left,
+# right), where "up" is towards row 1
+ORTHOGONAL_RAYS = {
+    square: (make_ray(square, 0, -1), make_ray(square, 0, 1), make_ray(square, -1, 0), make_ray(square, 1, 0))
+    for square in SQUARES
+}
+
+
+def make_palace_diagonal_rays():
+    """
+    Builds the rays along the diagonal lines of both palaces. From a corner, a chariot or cannon can slide through the
+    centre to the opposite corner; from the centre, it can slide one tile to each corner. Only used to build the
+    PALACE_DIAGONAL_RAYS table below.
+    :return: a dictionary of every tile to a tuple of its palace diagonal rays - empty for tiles off the diagonals
+    """
+    rays = {square: () for square in SQUARES}
+    for center in ('e2', 'e9'):
+        for columns, rows in ((-1, -1), (-1, 1), (1, -1), (1, 1)):
+            corner = shift_square(center, columns, rows)
+            rays[center] += ((corner,),)
+            rays[corner] += ((center, shift_square(center, -columns, -rows)),)
+    return rays
+
+
+PALACE_DIAGONAL_RAYS = make_palace_diagonal_rays()
+
+# Every ray a chariot or cannon can move along from each tile, palace diagonals included (empty rays left out)
+ROLLING_RAYS = {
+    square: tuple(ray for ray in ORTHOGONAL_RAYS[square] + PALACE_DIAGONAL_RAYS[square] if ray)
+    for square in SQUARES
+}
+
+# The tiles of each palace
+PALACE_SQUARES = {
+    'red': frozenset(('d1', 'd2', 'd3', 'e1', 'e2', 'e3', 'f1', 'f2', 'f3')),
+    'blue': frozenset(('d8', 'd9', 'd10', 'e8', 'e9', 'e10', 'f8', 'f9', 'f10'))
+}
+
+
+def make_move_tables():
+    """
+    Builds the tables of where each type of piece could move from each tile if there were no other pieces on the
+    board - the "basic moves" that the Game object narrows down at move time. Every Piece object shares these tables,
+    so a piece only has to know its type and its player (see Piece). Only used to build the _MOVES tables below.
+    :return: a tuple of four dictionaries, each keyed by the starting tile:
+        - for each color, the tiles a general or guard of that color can step to - one step along the lines of its
+          own palace
+        - for each color, the tiles a soldier of that color can step to - sideways, forwards, and diagonally forwards
+          along the lines of the enemy palace
+        - (leg, ends) pairs for each orthogonal direction a horse can set out in - the leg is the tile that blocks
+          the move, and the ends are the one or two tiles the horse can land on beyond it
+        - (leg, paths) pairs for each direction an elephant can set out in, where each path is a (middle, end) pair -
+          the elephant is blocked by a piece on either the leg or the middle tile
+    """
+    palace = {}
+    for color in ('blue', 'red'):
+        palace[color] = {}
+        for square in SQUARES:
+            steps = [tile for tile in ORTHOGONALS[square] if tile is not None]
+            steps += [ray[0] for ray in PALACE_DIAGONAL_RAYS[square]]
+            palace[color][square] = tuple(step for step in steps if step in PALACE_SQUARES[color])
+
+    soldiers = {}
+    for color, forward in (('blue', -1), ('red', 1)):
+        enemy_palace = PALACE_SQUARES[OPPONENT[color]]
+        soldiers[color] = {}
+        for square in SQUARES:
+            steps = [shift_square(square, -1, 0), shift_square(square, 1, 0), shift_square(square, 0, forward)]
+            # soldiers can't move backwards, so a diagonal step has to end one row further forwards
+            steps += [ray[0] for ray in PALACE_DIAGONAL_RAYS[square] if ray[0] in enemy_palace and
+                      SQUARE_INDEX[ray[0]] // 9 - SQUARE_INDEX[square] // 9 == forward]
+            soldiers[color][square] = tuple(step for step in steps if step is not None)
+
+    horses = {}
+    elephants = {}
+    for origin in SQUARES:
+        horse_moves = []
+        elephant_moves = []
+        for columns, rows in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            leg = shift_square(origin, columns, rows)
+            if leg is None:
+                continue
+            # both pieces step orthogonally onto the leg, then diagonally away from the origin
+            ends = []
+            paths = []
+            for side in (-1, 1):
+                if columns:
+                    diagonal_columns, diagonal_rows = columns, side
+                else:
+                    diagonal_columns, diagonal_rows = side, rows
+                middle = shift_square(leg, diagonal_columns, diagonal_rows)
+                if middle is None:
+                    continue
+                ends.append(middle)
+                end = shift_square(middle, diagonal_columns, diagonal_rows)
+                if end is not None:
+                    paths.append((middle, end))
+            if ends:
+                horse_moves.append((leg, tuple(ends)))
+            if paths:
+                elephant_moves.append((leg, tuple(paths)))
+        horses[origin] = tuple(horse_moves)
+        elephants[origin] = tuple(elephant_moves)
+
+    return palace, soldiers, horses, elephants
+
+
+PALACE_MOVES, SOLDIER_MOVES, HORSE_MOVES, ELEPHANT_MOVES = make_move_tables()
+
+
+def make_attack_tables():
+    """
+    Builds the tables used to find out whether a tile is attacked, working backwards from the tile to the tiles an
+    attacking piece would have to stand on - the move tables above, turned around. Only used to build the ATTACK_
+    tables below.
+
+    Every tile in the tables is given by its index in SQUARES, so that the attack test can read the Board's flat list
+    of tiles directly.
+    :return: a tuple of five dictionaries, each keyed by the attacked tile:
+        - the rays a chariot or cannon would attack along, as in ROLLING_RAYS
+        - (origin, leg) pairs for each horse move that ends on the tile - the leg is the tile that blocks it
+        - (origin, leg, middle) triples for each elephant move that ends on the tile
+        - for each color, the tiles a soldier of that color could move to the tile from
+        - for each color, the tiles a general or guard of that color could move to the tile from
+    """
+    index = SQUARE_INDEX
+    rays = {square: tuple(tuple(index[tile] for tile in ray) for ray in ROLLING_RAYS[square]) for square in SQUARES}
+    horses = {square: [] for square in SQUARES}
+    elephants = {square: [] for square in SQUARES}
+    soldiers = {color: {square: [] for square in SQUARES} for color in ('blue', 'red')}
+    palace_pieces = {color: {square: [] for square in SQUARES} for color in ('blue', 'red')}
+    for origin in SQUARES:
+        for leg, ends in HORSE_MOVES[origin]:
+            for end in ends:
+                horses[end].append((index[origin], index[leg]))
+        for leg, paths in ELEPHANT_MOVES[origin]:
+            for middle, end in paths:
+                elephants[end].append((index[origin], index[leg], index[middle]))
+        for color in ('blue', 'red'):
+            for end in SOLDIER_MOVES[color][origin]:
+                soldiers[color][end].append(index[origin])
+            for end in PALACE_MOVES[color][origin]:
+                palace_pieces[color][end].append(index[origin])
+
+    return (rays, {square: tuple(origins) for square, origins in horses.items()},
+            {square: tuple(origins) for square, origins in elephants.items()},
+            {color: {square: tuple(origins) for square, origins in soldiers[color].items()} for color in soldiers},
+            {color: {square: tuple(origins) for square, origins in palace_pieces[color].items()}
+             for color in palace_pieces})
+
+
+ATTACK_RAYS, ATTACK_HORSES, ATTACK_ELEPHANTS, ATTACK_SOLDIERS, ATTACK_PALACE_PIECES = make_attack_tables()
+
+# The Board also keeps the position as bitboards - Python ints used as 90-bit sets of tiles, where the tile with index
+# i in SQUARES is bit i. Each tile's own bit, keyed by the tile:
+SQUARE_BITS = {square: 1 << index for index, square in enumerate(SQUARES)}
+
+# Every tile on the board
+BOARD_MASK = (1 << 90) - 1
+
+# The tiles along each edge of the board - a bitboard has to drop the tiles on an edge before being shifted towards it,
+# or they would wrap around onto the next row
+FILE_A_MASK = sum(SQUARE_BITS['a' + str(row)] for row in range(1, 11))
+FILE_I_MASK = sum(SQUARE_BITS['i' + str(row)] for row in range(1, 11))
+ROW_1_MASK = sum(SQUARE_BITS[column + '1'] for column in COLUMNS)
+ROW_10_MASK = sum(SQUARE_BITS[column + '10'] for column in COLUMNS)
+
+# The tiles of each palace, and the tiles on the diagonal lines of both palaces (corners and centres)
+PALACE_MASKS = {color: sum(SQUARE_BITS[square] for square in PALACE_SQUARES[color]) for color in PALACE_SQUARES}
+PALACE_DIAGONAL_MASK = sum(SQUARE_BITS[square] for square in ('d1', 'f1', 'e2', 'd3', 'f3', 'd8', 'f8', 'e9', 'd10',
+                                                                 'f10'))
+
+
+def shift_mask(mask, columns, rows):
+    """
+    Moves every tile of a bitboard one step across the board, dropping tiles that would step off an edge.
+    :param mask: the bitboard to shift
+    :param columns: the change in column - -1, 0 or 1
+    :param rows: the change in row - -1, 0 or 1
+    :return: the shifted bitboard
+    """
+    if columns == 1:
+        mask &= ~FILE_I_MASK
+    elif columns == -1:
+        mask &= ~FILE_A_MASK
+    if rows == 1:
+        mask &= ~ROW_10_MASK
+    elif rows == -1:
+        mask &= ~ROW_1_MASK
+    shift = columns + 9 * rows
+    return mask << shift if shift > 0 else mask >> -shift
+
+
+def lowest_index(mask):
+    """
+    Returns the index of the lowest tile in a (non-empty) bitboard
+    """
+    return (mask & -mask).bit_length() - 1
+
+
+def highest_index(mask):
+    """
+    Returns the index of the highest tile in a (non-empty) bitboard
+    """
+    return mask.bit_length() - 1
+
+
+def make_bitboard_tables():
+    """
+    Builds the bitboard tables used by the move generators and the attack test, so that both can test whole sets of
+    tiles with a single "and" rather than looking at the tiles one by one. Only used to build the _MASKS tables below.
+    :return: a tuple of four dictionaries, each keyed by tile:
+        - (ray, mask, step) triples for each of the tile's ROLLING_RAYS - the ray itself, its tiles as a bitboard, and
+          the change in tile index on each step along it. The first piece along a ray is the lowest tile of the
+          ray's occupied tiles if the step is positive, otherwise the highest, and its distance along the ray is the
+          change in index divided by the step.
+        - the tiles a horse, and an elephant, would have to be on to attack the tile, as two bitboards in a pair
+        - for each color, the tiles a soldier of that color would have to be on to attack the tile
+        - for each color, the tiles a general or guard of that color would have to be on to attack the tile
+    """
+    rays = {}
+    mammals = {}
+    soldiers = {'blue': {}, 'red': {}}
+    palace_pieces = {'blue': {}, 'red': {}}
+    for index, square in enumerate(SQUARES):
+        bit = SQUARE_BITS[square]
+        rays[square] = tuple((ray, sum(SQUARE_BITS[tile] for tile in ray), SQUARE_INDEX[ray[0]] - index)
+                             for ray in ROLLING_RAYS[square])
+        mammals[square] = (sum(1 << origin for origin, _ in ATTACK_HORSES[square]),
+                           sum(1 << origin for origin, _, _ in ATTACK_ELEPHANTS[square]))
+
+        # palace moves go both ways, so the tiles a general or guard could attack from are the tiles it could step
+        # to - orthogonally inside the palace, or diagonally from one point on the palace lines to the next
+        orthogonal = shift_mask(bit, -1, 0) | shift_mask(bit, 1, 0) | shift_mask(bit, 0, -1) | shift_mask(bit, 0, 1)
+        diagonal = 0
+        if bit & PALACE_DIAGONAL_MASK:
+            diagonal = (shift_mask(bit, -1, -1) | shift_mask(bit, -1, 1) | shift_mask(bit, 1, -1) |
+                        shift_mask(bit, 1, 1)) & PALACE_DIAGONAL_MASK
+        for color in ('blue', 'red'):
+            palace_pieces[color][square] = (orthogonal | diagonal) & PALACE_MASKS[color] if bit & PALACE_MASKS[color] \
+                else 0
+
+        # a soldier attacks from beside the tile or from the row behind it - diagonally behind it only along the
+        # lines of the enemy palace
+        for color, backward in (('blue', 1), ('red', -1)):
+            enemy_palace = PALACE_MASKS[OPPONENT[color]]
+            origins = shift_mask(bit, -1, 0) | shift_mask(bit, 1, 0) | shift_mask(bit, 0, backward)
+            if bit & enemy_palace & PALACE_DIAGONAL_MASK:
+                origins |= (shift_mask(bit, -1, backward) | shift_mask(bit, 1, backward)) & enemy_palace & \
+                           PALACE_DIAGONAL_MASK
+            soldiers[color][square] = origins
+
+    return rays, mammals, soldiers, palace_pieces
+
+
+RAY_MASKS, ATTACK_MAMMAL_MASKS, ATTACK_SOLDIER_MASKS, ATTACK_PALACE_MASKS = make_bitboard_tables()
+
+
+def make_zobrist_keys():
+    """
+    Builds the random 64-bit numbers used to hash positions (Zobrist hashing). A position's key is the exclusive-or
+    of the number for each piece code on each tile, plus one more number when it is red's turn, so moving a piece
+    only takes a few exclusive-ors to update. The numbers come from a fixed seed, so every process, and every run,
+    gives the same position the same key.
+    :return: a tuple of a list of piece keys, indexed by piece code and then by tile index, and the red-to-move key
+    """
+    generator = random.Random(0x4A616E676769)
+    piece_keys = [[generator.getrandbits(64) for _ in SQUARES] for _ in range(RED + SOLDIER + 1)]
+    return piece_keys, generator.getrandbits(64)
+
+
+ZOBRIST_PIECES, ZOBRIST_RED_TO_MOVE = make_zobrist_keys()
+
+# The states a game can be in, as returned by JanggiGame.get_game_state
+GAME_STATES = ('UNFINISHED', 'BLUE_WON', 'RED_WON')
+
+# Material values used by the search, indexed by piece code. The general is never captured, so it has no value.
+PIECE_VALUES = [0, 0, 300, 300, 500, 1300, 700, 200] * 2
+
+# Piece values used by static exchange evaluation (see JanggiGame.see) - as PIECE_VALUES, except that the general
+# is worth more than everything else put together, so that it only ever captures last and losing it outweighs
+# anything gained
+SEE_VALUES = [value or 100000 for value in PIECE_VALUES]
+SEE_VALUES[EMPTY] = SEE_VALUES[RED] = 0
+
+# Search scores - a checkmate scores MATE_SCORE less the number of moves it takes, so that quicker mates score higher
+MATE_SCORE = 1000000
+INFINITE_SCORE = 2 * MATE_SCORE
+DEFAULT_SEARCH_DEPTH = 3
 
 
 class JanggiGame:
@@ -17,7 +372,12 @@ class JanggiGame:
         The initialization method for the JanggiGame class. Takes no parameters, and creates three data members:
         a "players" data member that creates two Player objects to play the "game", a "board" data member that
         creates a Board object to play the game on, and a "game_state" data member that tracks whether the game
-        is in progress or has been won.
+        is in progress or has been won. A "search" data member holds the Search object used by best_move, which is
+        only created the first time it is needed, and a "book" data member the OpeningBook used by book_moves, if
+        one has been set. Finally, a "history" data member keeps every move made with make_move, so that it can be
+        taken back with undo, and an "undone" data member the moves taken back, so that they can be made again with
+        redo. A "move_cache" data member holds the MoveCache used by legal_moves, if one has been set, and an
+        "instrumentation" data member the game's counts and timings, once instrumentation has been enabled (see stats).
         """
         self._players = {
             'blue': Player(True),
@@ -25,6 +385,12 @@ class JanggiGame:
         }
         self._board = Board(self._players)
         self._game_state = 'UNFINISHED'
+        self._search = None
+        self._book = None
+        self._history = []
+        self._undone = []
+        self._move_cache = None
+        self._instrumentation = None
 
     def get_game_state(self):
         """
@@ -52,13 +418,25 @@ class JanggiGame:
         """
         return player.get_turn()
 
+    def get_turn_color(self):
+        """
+        :return: the color of the player whose turn it is - either "blue" or "red"
+        """
+        if self._players['blue'].get_turn():
+            return 'blue'
+        return 'red'
+
     def is_in_check(self, color):
         """
-        Method to determine whether the player associated with the color passed is in check or not
+        Method to determine whether the player associated with the color passed is in check or not, by asking
+        whether the other player attacks the tile their general is on
         :param color: the color associated with a Player object - either "blue" or "red"
-        :return: Returns the value of the Player's "check_status" data member - either True or False
+        :return: Returns True if the player's general is under attack, otherwise False
         """
-        return self.get_player_dictionary()[color].get_check_status()
+        general_position = self.get_board().get_general_position(color)
+        if general_position is None:
+            return False
+        return self.is_square_attacked(general_position, OPPONENT[color])
 
     def set_board_and_players(self, board_object):
         """
@@ -91,7 +469,8 @@ class JanggiGame:
     def update_turn(self):
         """
         Method to switch the turn values of the game's Player objects - if a Player currently has the value of "True"
-        in their "turn" data member, it will switch to "False" and vice versa
+        in their "turn" data member, it will switch to "False" and vice versa. The Board's position key is updated to
+        match.
         :return: None
         """
         players = self.get_player_dictionary()
@@ -100,6 +479,7 @@ class JanggiGame:
                 players[player].set_turn(True)
             else:
                 players[player].set_turn(False)
+        self._board.switch_side_key()
 
     def make_move(self, start_position, end_position):
         """
@@ -145,6 +525,7 @@ class JanggiGame:
         # otherwise, allow them to pass the turn - don't make any changes to the board, but update the turn
         elif start_position == end_position:
             # print("you've passed the turn")
+            self.record_move(start_position, end_position, None)
             self.update_turn()
             return True
 
@@ -152,6 +533,10 @@ class JanggiGame:
         valid_and_doesnt_cause_check = self.is_move_valid(start_position, end_position)
 
         if valid_and_doesnt_cause_check:
+            # the move stays on the board's move stack - keep it in the game's history too, along with the check
+            # statuses and game state from before it, so that it can be taken back
+            self.record_move(start_position, end_position, self.get_board().get_move_stack()[-1][2])
+
             # if the piece's move ensures that their general is not or no longer in check, then the player's check
             # status should be false
             self.get_board().get_tiles()[end_position].get_player().set_check_status(False)
@@ -166,6 +551,478 @@ class JanggiGame:
         # print("move is blocked or causes check")
         return False
 
+    def record_move(self, start_position, end_position, captured):
+        """
+        Method to add a move that make_move is about to complete to the game's history, along with the players'
+        check statuses and the game state from before it. Any moves that were taken back with undo can no longer be
+        made again with redo.
+        :param start_position: the starting position of the move
+        :param end_position: the end position of the move - the same as the start for a pass
+        :param captured: the Piece object captured by the move, or None
+        :return: None
+        """
+        players = self._players
+        self._history.append((start_position, end_position, captured, players['blue'].get_check_status(),
+                              players['red'].get_check_status(), self._game_state))
+        self._undone = []
+
+    def undo(self):
+        """
+        Method to take back the last move made with make_move (or redo). The board's "pop" method puts the pieces
+        back, and the turn, the players' check statuses and the game state go back to what they were before the move.
+        :return: True if a move was taken back, False if there were no moves to take back
+        """
+        if not self._history:
+            return False
+        self._undone.append(self.swap_move_state(self._history.pop(), True))
+        return True
+
+    def redo(self):
+        """
+        Method to make again the last move taken back with undo. The board's "push" method moves the pieces, and the
+        turn, the players' check statuses and the game state go back to what they were after the move.
+        :return: True if a move was made again, False if there were no moves to make again
+        """
+        if not self._undone:
+            return False
+        self._history.append(self.swap_move_state(self._undone.pop(), False))
+        return True
+
+    def swap_move_state(self, entry, taking_back):
+        """
+        Method used by undo and redo to move between the states before and after a move - the move is taken back or
+        made on the board, the turn is updated, and the check statuses and game state are set from the entry
+        :param entry: a (start_position, end_position, captured, blue_in_check, red_in_check, game_state) tuple from
+        the game's history or undone moves
+        :param taking_back: True if the move is being taken back, False if it is being made again
+        :return: a tuple in the same form, with the check statuses and game state that were replaced - the entry to
+        swap back again
+        """
+        start_position, end_position, captured, blue_in_check, red_in_check, game_state = entry
+        players = self._players
+        swapped = (start_position, end_position, captured, players['blue'].get_check_status(),
+                   players['red'].get_check_status(), self._game_state)
+        board = self.get_board()
+        if start_position != end_position:
+            if taking_back:
+                board.pop()
+            else:
+                board.push(start_position, end_position)
+        self.update_turn()
+        players['blue'].set_check_status(blue_in_check)
+        players['red'].set_check_status(red_in_check)
+        self._game_state = game_state
+        return swapped
+
+    def get_move_history(self):
+        """
+        :return: a list of the (start_position, end_position) moves made in the game, oldest first, leaving out any
+        that have been taken back with undo
+        """
+        return [(entry[0], entry[1]) for entry in self._history]
+
+    def legal_moves(self, color=None):
+        """
+        Method to find every move a player can legally make, without making any of them. Each piece's possible moves
+        come from the same "make_x_move" methods that make_move uses (see pseudo_legal_moves); each one is then kept
+        if it doesn't leave the player's general open to capture, which exposes_general finds out from the board's
+        bitboards without making the move.
+        If the game has a move cache (see set_move_cache), the moves are looked up there first.
+
+        Passing the turn is included as a move from the general's tile to itself, as long as the player isn't in
+        check (which is when make_move allows it).
+        :param color: the color of the player to find moves for - either "blue" or "red". By default, the player
+        whose turn it is.
+        :return: A list of (start_position, end_position) tuples, one for each legal move. The list is empty once
+        the game is over.
+        """
+        if self.get_game_state() != 'UNFINISHED':
+            return []
+        if color is None:
+            color = self.get_turn_color()
+
+        board = self.get_board()
+        cache = self._move_cache
+        if cache is not None:
+            cached_moves = cache.probe(board, color, MoveCache.LEGAL)
+            if cached_moves is not None:
+                return list(cached_moves)
+
+        enemy = OPPONENT[color]
+        moves = [move for move in self.pseudo_legal_moves(color) if not self.exposes_general(move[0], move[1], board)]
+
+        general_position = board.get_general_position(color)
+        if general_position is not None and not self.is_square_attacked(general_position, enemy, board):
+            moves.append((general_position, general_position))
+
+        if cache is not None:
+            cache.store(board, color, MoveCache.LEGAL, moves)
+        return moves
+
+    def pseudo_legal_moves(self, color=None):
+        """
+        Method to find every move each of a player's pieces could make with the "make_x_move" methods, whether or
+        not it leaves the player's general open to capture. Passing isn't included. If the game has a move cache
+        (see set_move_cache), the moves are looked up there first.
+        :param color: the color of the player to find moves for - either "blue" or "red". By default, the player
+        whose turn it is.
+        :return: A list of (start_position, end_position) tuples
+        """
+        if color is None:
+            color = self.get_turn_color()
+
+        board = self.get_board()
+        cache = self._move_cache
+        if cache is not None:
+            cached_moves = cache.probe(board, color, MoveCache.PSEUDO_LEGAL)
+            if cached_moves is not None:
+                return list(cached_moves)
+
+        tiles = board.get_tiles()
+        moves = []
+        for start in board.get_piece_positions(color):
+            if tiles[start].get_type() in (GENERAL, GUARD):
+                possible_moves = self.make_general_or_guard_move(start, board)
+            else:
+                possible_moves = self.get_move_function(start, board)
+            for end in possible_moves:
+                moves.append((start, end))
+
+        if cache is not None:
+            cache.store(board, color, MoveCache.PSEUDO_LEGAL, moves)
+        return moves
+
+    def set_move_cache(self, cache):
+        """
+        Sets the MoveCache used by legal_moves and pseudo_legal_moves (and so by the search). One cache can be shared
+        by many games, since its moves only depend on the position.
+        :param cache: a MoveCache object, or None to stop using a cache
+        :return: None
+        """
+        self._move_cache = cache
+
+    def get_move_cache(self):
+        """
+        :return: the game's MoveCache object, or None if it doesn't have one
+        """
+        return self._move_cache
+
+    def see(self, start_position, end_position):
+        """
+        Method to work out whether a move wins or loses material once every capture that follows on the end tile
+        has been made ("static exchange evaluation"). After the move, each player in turn captures on the end tile
+        with their least valuable piece that can reach it, found with find_checks, and either player can stop
+        capturing whenever carrying on would lose them material. The captures are made in place on the board and
+        taken back again, so cannon screens that appear or disappear as pieces come and go, and moves along the
+        palace diagonals, are all accounted for; the only thing not checked is whether a capture would leave the
+        capturing player's own general in check.
+        :param start_position: the starting position of the move - there must be a piece on it that can make the move
+        :param end_position: the end position of the move
+        :return: the material the player making the move can expect to win, in the units of PIECE_VALUES - negative
+        if they can expect to lose material, and 0 for an even exchange or a move that nothing can capture on. A pass
+        (a move from a tile to itself), or a move onto one of the player's own pieces, isn't an exchange at all, and
+        scores 0.
+        """
+        board = self.get_board()
+        squares = board.get_squares()
+        tiles = board.get_tiles()
+        target = SQUARE_INDEX[end_position]
+        player = tiles[start_position].get_player()
+        color = player.get_color()
+        if start_position == end_position or (tiles[end_position] is not None and
+                                              tiles[end_position].get_player() is player):
+            return 0
+
+        # gains[n] is what the player making the nth capture wins, if the other player stops there
+        gains = [SEE_VALUES[squares[target]]]
+        board.push(start_position, end_position)
+        captures = 1
+        side = OPPONENT[color]
+        while True:
+            attackers = self.find_checks(end_position, side, board)
+            if not attackers:
+                break
+            origin = min(attackers, key=lambda check: SEE_VALUES[squares[check[0]]])[0]
+            gains.append(SEE_VALUES[squares[target]] - gains[-1])
+            board.push(SQUARES[origin], end_position)
+            captures += 1
+            side = OPPONENT[side]
+        for _ in range(captures):
+            board.pop()
+
+        # working backwards, each player only makes their capture if it's better for them than stopping
+        for index in range(len(gains) - 1, 0, -1):
+            gains[index - 1] = -max(-gains[index - 1], gains[index])
+        return gains[0]
+
+    def stats(self):
+        """
+        Method to report what the game (and its board) has done while instrumentation was enabled (see
+        enable_instrumentation) - how many times each type of piece's moves were generated, how many check tests,
+        checkmate searches and moves made in place on the board there were, and how long each phase of making a move
+        took
+        :return: a dictionary of "counters" and "phases", as made by Instrumentation.as_dict - both empty if
+        instrumentation has never been enabled while the game was played
+        """
+        combined = Instrumentation()
+        for source in (self._instrumentation, self.get_board().get_instrumentation()):
+            if source is not None:
+                combined.merge(source)
+        return combined.as_dict()
+
+    def perft(self, depth):
+        """
+        Method to count the positions that can be reached from the current position in exactly the given number of
+        moves ("perft"), walking the whole tree of legal moves. Passes are counted as moves. The count only depends
+        on the move generators, so comparing it against a known count is a check that they are correct, and timing it
+        is a measure of how fast they are (see perft_benchmark).
+        :param depth: the number of moves to look ahead
+        :return: the number of positions reached - 1 when depth is 0
+        """
+        return self.count_perft_nodes(self.get_turn_color(), depth)
+
+    def divide(self, depth):
+        """
+        Method to split a perft count up by the first move made, which is used to track down where two move
+        generators disagree - the move whose count differs is the one to look at, one move deeper.
+        :param depth: the number of moves to look ahead, counting the first move
+        :return: a dictionary of each legal (start_position, end_position) move to the number of positions reached
+        after it
+        """
+        color = self.get_turn_color()
+        counts = {}
+        for move in self.legal_moves(color):
+            counts[move] = self.count_perft_move(move, OPPONENT[color], depth - 1)
+        return counts
+
+    def count_perft_nodes(self, color, depth):
+        """
+        Counts the positions reached from the current board in a given number of moves, with the given player to
+        move first. Moves are made in place on the board with its "push" method and taken back with "pop", so the
+        board ends up as it started; the players' turns and the game state are not changed.
+        :param color: the color of the player to move
+        :param depth: the number of moves to look ahead
+        :return: the number of positions reached
+        """
+        if depth == 0:
+            return 1
+        moves = self.legal_moves(color)
+        # the last move of each line doesn't need to be made - its positions are just counted
+        if depth == 1:
+            return len(moves)
+        enemy = OPPONENT[color]
+        return sum(self.count_perft_move(move, enemy, depth - 1) for move in moves)
+
+    def count_perft_move(self, move, color, depth):
+        """
+        Makes a move on the board, counts the positions reached from there with count_perft_nodes, and takes the move
+        back again
+        :param move: the (start_position, end_position) move to make - a pass if the two are the same
+        :param color: the color of the player to move after the move
+        :param depth: the number of moves to look ahead after the move
+        :return: the number of positions reached
+        """
+        start, end = move
+        if start == end:
+            return self.count_perft_nodes(color, depth)
+        board = self.get_board()
+        board.push(start, end)
+        nodes = self.count_perft_nodes(color, depth)
+        board.pop()
+        return nodes
+
+    def set_opening_book(self, book):
+        """
+        Sets the OpeningBook used by book_moves
+        :param book: an OpeningBook object, or None to stop using a book
+        :return: None
+        """
+        self._book = book
+
+    def book_moves(self):
+        """
+        Method to look the current position up in the game's opening book (see set_opening_book), which answers
+        without any searching
+        :return: a list of ((start_position, end_position), games, wins) tuples, one for each move the book has for
+        the position, most played first - games is the number of games the move was played in, and wins the number
+        of those the player who made it went on to win. The list is empty if there's no book, the book doesn't have
+        the position, or the game is over.
+        """
+        if self._book is None or self.get_game_state() != 'UNFINISHED':
+            return []
+        tiles = self.get_board().get_tiles()
+        color = self.get_turn_color()
+        # two positions could, very rarely, share a key - only keep moves of a piece the player actually has
+        return [entry for entry in self._book.lookup(self.get_board().hash_key())
+                if tiles[entry[0][0]] is not None and tiles[entry[0][0]].get_player().get_color() == color]
+
+    def best_move(self, depth=None, time_limit_ms=None):
+        """
+        Method to find the best move for the player whose turn it is, using the game's Search object (see the
+        Search class). The move isn't made - pass it to make_move to play it. The Search object, and its
+        transposition table, is kept between calls, so later searches can reuse what earlier ones found.
+        :param depth: the number of moves ahead to search. If a time limit is given instead, the search goes as deep
+        as it can in that time; if neither is given, DEFAULT_SEARCH_DEPTH is used.
+        :param time_limit_ms: the most time, in milliseconds, the search should take
+        :return: the best (start_position, end_position) move found - a pass is a move from the general's tile to
+        itself - or None if the game is over
+        """
+        if self.get_game_state() != 'UNFINISHED':
+            return None
+        if self._search is None:
+            self._search = Search(self)
+        return self._search.find_best_move(depth, time_limit_ms)
+
+    def analyze(self, depth=DEFAULT_SEARCH_DEPTH, time_limit_ms=None, workers=None, executor=None):
+        """
+        Method to score every legal move of the player whose turn it is, searching the moves in parallel in
+        separate processes so that more than one core can be used. Each move is made, the resulting position is
+        encoded with encode_position, and the encoded position is handed to a worker process, which searches it to a
+        fixed depth with a Search of its own (see search_position). Scores are collected as the workers finish.
+        :param depth: the number of moves ahead to search, counting the move being scored
+        :param time_limit_ms: the most time, in milliseconds, to wait for the workers. Moves whose search hasn't
+        finished by then are left out of the results.
+        :param workers: the number of worker processes to start, if no executor is given - by default, one per core
+        :param executor: a concurrent.futures executor to run the searches on. By default, a ProcessPoolExecutor is
+        started for the call and shut down at the end of it; passing one in saves starting new processes each time.
+        :return: A list of ((start_position, end_position), score) tuples, best move first. Scores are from the
+        point of view of the player to move, in the units of PIECE_VALUES.
+        """
+        board = self.get_board()
+        positions = {}
+        for move in self.legal_moves():
+            if move[0] != move[1]:
+                board.push(move[0], move[1])
+            board.switch_side_key()
+            positions[move] = self.encode_position(OPPONENT[self.get_turn_color()])
+            board.switch_side_key()
+            if move[0] != move[1]:
+                board.pop()
+
+        own_executor = executor is None
+        if own_executor:
+            executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = {executor.submit(search_position, position, depth - 1): move
+                       for move, position in positions.items()}
+            timeout = None if time_limit_ms is None else time_limit_ms / 1000
+            done, not_done = wait(futures, timeout=timeout)
+            for future in not_done:
+                future.cancel()
+        finally:
+            if own_executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        # each worker scores its position for the other player, and counts a mate from its own position
+        results = [(futures[future], Search.score_from_table(-future.result(), 1)) for future in done]
+        results.sort(key=lambda result: result[1], reverse=True)
+        return results
+
+    def encode_position(self, turn_color=None):
+        """
+        Method to encode the current position in a compact form that can be passed between processes - the piece
+        code of each of the 90 tiles (see the Board's get_squares method), followed by 0 if it is blue's turn or 1 if
+        it is red's
+        :param turn_color: the color of the player to move - by default, the player whose turn it is
+        :return: a bytes object of length 91
+        """
+        if turn_color is None:
+            turn_color = self.get_turn_color()
+        return bytes(self.get_board().get_squares()) + (b'\x00' if turn_color == 'blue' else b'\x01')
+
+    def decode_position(self, position):
+        """
+        Method to set up the game from a position made by encode_position. New Piece objects are placed wherever
+        the board differs from the position, the turn is given to the player to move, each player's check status is
+        worked out from the position, and the game is treated as in progress. The game's move history (see undo) is
+        emptied.
+        :param position: the bytes object made by encode_position
+        :return: None
+        """
+        self.get_board().set_position_bytes(position[:90])
+        self._history = []
+        self._undone = []
+        self.set_turn_color('blue' if position[90] == 0 else 'red')
+        for color in self._players:
+            self._players[color].set_check_status(self.is_in_check(color))
+        self._game_state = 'UNFINISHED'
+
+    def snapshot(self):
+        """
+        Method to save the whole state of the game as a small, immutable value, which restore can set the game (or
+        any other game) back to. This is much cheaper than copying the game, and the value can be stored, compared,
+        or sent to another process as it is.
+        :return: a bytes object of length 93 - the position as made by encode_position, then a byte with 1 added if
+        blue is in check and 2 if red is, then the index of the game state in GAME_STATES
+        """
+        players = self._players
+        flags = int(players['blue'].get_check_status()) | int(players['red'].get_check_status()) << 1
+        return self.encode_position() + bytes((flags, GAME_STATES.index(self._game_state)))
+
+    def restore(self, snapshot):
+        """
+        Method to set the game back to a state saved by snapshot. Only the tiles that differ from the snapshot are
+        changed on the board, and the board's move stack and the game's move history (see undo) are emptied.
+        :param snapshot: the bytes object made by snapshot
+        :return: None
+        """
+        self.get_board().set_position_bytes(snapshot[:90])
+        self._history = []
+        self._undone = []
+        self.set_turn_color('blue' if snapshot[90] == 0 else 'red')
+        self._players['blue'].set_check_status(bool(snapshot[91] & 1))
+        self._players['red'].set_check_status(bool(snapshot[91] & 2))
+        self._game_state = GAME_STATES[snapshot[92]]
+
+    def reset(self):
+        """
+        Method to set the game back to the starting position, ready to be played again. Unlike rewind, this works
+        whatever the game's position, and it's much cheaper than creating a new JanggiGame - the Board copies the
+        starting position from the module's STARTING_BOARD (see the Board's reset method) rather than setting it up
+        piece by piece. Blue gets the turn back, neither player is in check, the game is treated as in progress, and
+        its move history (see undo) is emptied. The game's search, opening book and move cache are kept, but its
+        instrumentation counts (see stats) are cleared, so that a game handed out again by a GamePool starts from
+        nothing - the module-wide totals in INSTRUMENTATION are kept.
+        :return: None
+        """
+        # the turn goes back to blue first, since that also updates the position key, which the board then replaces
+        self.set_turn_color('blue')
+        self.get_board().reset()
+        self._history = []
+        self._undone = []
+        for color in self._players:
+            self._players[color].set_check_status(False)
+        self._game_state = 'UNFINISHED'
+        self._instrumentation = None
+
+    def set_turn_color(self, color):
+        """
+        Method to give the turn to a player, updating the turn if it isn't already theirs
+        :param color: the color of the player to move - either "blue" or "red"
+        :return: None
+        """
+        if self.get_turn_color() != color:
+            self.update_turn()
+
+    def rewind(self):
+        """
+        Method to take back every move of a game begun from the starting position, using the Board's "pop" method,
+        so that the same Board and Piece objects can be used for another game rather than creating new ones. Blue
+        gets the turn back, neither player is in check, the game is treated as in progress, and its move history
+        (see undo) is emptied.
+        :return: None
+        """
+        board = self.get_board()
+        while board.get_move_stack():
+            board.pop()
+        self._history = []
+        self._undone = []
+        if self._players['red'].get_turn():
+            self.update_turn()
+        for color in self._players:
+            self._players[color].set_check_status(False)
+        self._game_state = 'UNFINISHED'
+
     def check_checkmate(self, end_position):
         """
         Method to determine whether a given move has put the other player in check or checkmate.
@@ -177,46 +1034,28 @@ class JanggiGame:
         board = self.get_board().get_tiles()
         current_board = self.get_board()
 
-        # find the position of the enemy general to see if it's been placed in check
-        general_position = self.find_general(board[end_position], 'enemy', board)
-
-        friendly_pieces = self.get_friendly_or_enemy_pieces(board[end_position], 'friendly', board)
+        # find the position of the enemy general to see if it's been placed in check - the Board keeps track of
+        # where both generals and every player's pieces are, so there's no need to search the tiles for them
+        color = board[end_position].get_player().get_color()
+        general_position = current_board.get_general_position(OPPONENT[color])
 
-        # iterate through each friendly piece and see whether they can move to the general's position
-        # on their next turn
-        if self.first_check(friendly_pieces, general_position, current_board):
+        # see whether any friendly piece could move to the general's position on their next turn
+        if self.is_square_attacked(general_position, color, current_board):
             # if they can capture the general, then put the other player in check
             board[general_position].get_player().set_check_status(True)
         else:
             board[general_position].get_player().set_check_status(False)
 
         if board[general_position].get_player().get_check_status() is True:
-            # now let's look at the other player - can any of their pieces move to get the general out of check?
-            friendly_pieces = self.get_friendly_or_enemy_pieces(board[general_position], 'friendly', board)
-            for location in friendly_pieces:
-                if str(board[location]) == 'general' or str(board[location]) == 'guard':
-                    moves = self.make_general_or_guard_move(location, board)
-                else:
-                    moves = self.get_move_function(location, board)
-                if moves is not None:
-                    for move in moves:
-                        # We're going to "pretend" to make a move, so we need to make a copy of the board
-                        # and "hypothetically" see if the move is valid and gets the general out of check
-                        hypothetical_move_board = copy.deepcopy(self.get_board())
-                        piece = hypothetical_move_board.get_tiles()[location]
-
-                        # move the piece to its hypothetical location on the copied board
-                        hypothetical_move_board.set_board_position(move, piece)
-                        hypothetical_move_board.set_board_position(location, None)
-
-                        # if it's still check, reset the board and try with the next move
-                        if self.still_check(move, hypothetical_move_board):
-                            self.set_board_and_players(current_board)
-                        # if the move breaks check, reset the board and return - no checkmate today!
-                        else:
-                            self.set_board_and_players(current_board)
-                            # print("you can get out of check")
-                            return
+            # now let's look at the other player - can any of their pieces move to get the general out of check? Only
+            # the moves that could possibly do so need to be tried (see find_evasions)
+            for location, move in self.find_evasions(OPPONENT[color], current_board):
+                # We "pretend" to make the move, working out whether it would get the general out of check without
+                # changing the board (see exposes_general)
+                # if the move breaks check, return - no checkmate today!
+                if not self.exposes_general(location, move, current_board):
+                    # print("you can get out of check")
+                    return
 
             # if we've iterated through every possible move for every possible piece and none of them
             # have canceled check, then it's checkmate!
@@ -228,50 +1067,216 @@ class JanggiGame:
         # print("not checkmate")
         return
 
-    def first_check(self, friendly_pieces, enemy_general_position, board):
-        """
-        Method that looks at the current player's pieces to see if any of them can "capture" the enemy general
-        on the next turn
-        :param friendly_pieces: a list of all positions containing pieces belonging to the current player
-        :param enemy_general_position: the board position of the other player's general
-        :param board: the current board being played on
-        :return: Returns true if one of the player's pieces can capture the general next turn - i.e., has the
-        other player in check. Returns false otherwise
-        """
-        check_board = board.get_tiles()
-        # get the possible moves for each piece on the next turn
-        for piece_position in friendly_pieces:
-            if str(check_board[piece_position]) == 'general' or str(check_board[piece_position]) == 'guard':
-                moves = self.make_general_or_guard_move(piece_position, check_board)
-            else:
-                moves = self.get_move_function(piece_position, check_board)
+    def is_square_attacked(self, square, by_color, board=None):
+        """
+        Method that looks at whether any of a player's pieces could move to a given tile on their next turn - used
+        to find out whether a general is in check. Rather than generating every move of every piece, this works
+        backwards from the tile: it looks along the tile's rays for chariots and cannons (palace diagonals included),
+        and at the few tiles a horse, elephant, soldier, general or guard would have to be on to reach it. The
+        module's ATTACK_ tables list those tiles, so the cost depends on how many pieces could attack the tile, not
+        on how many pieces the player has.
 
-            # then see if any of those positions is the same as the enemy general's
-            if moves is not None and enemy_general_position in moves:
-                return True
-        return False
+        The test is done on the Board's bitboards: each set of tiles an attacker would have to stand on is checked
+        against the tiles that kind of piece is on with a single "and", and the first (and second) piece along each
+        ray is found from the ray's occupied tiles rather than by walking the ray.
+
+        The piece on the tile itself only matters in that a cannon can never capture another cannon.
+        :param square: the tile to look at, e.g. "e9"
+        :param by_color: the color of the player whose pieces might attack the tile - either "blue" or "red"
+        :param board: the Board object being used - by default, the actual board associated with the Game object
+        :return: Returns True if one of the player's pieces could move to the tile, otherwise False
+        """
+        if board is None:
+            board = self.get_board()
+        return self.is_attacked_on_bitboards(square, by_color, board.get_occupancy(), board.get_piece_masks())
 
-    def still_check(self, move, board):
+    def is_attacked_on_bitboards(self, square, by_color, occupied, piece_masks):
         """
-        Method that checks to see whether a "hypothetical" move by a piece has gotten that piece's general
-        out of check. To do this, it iterates through each enemy piece and sees whether they can capture
-        the general on their next turn.
-        :param move: The starting position of the piece being checked - this should be one of the possible
-        moves determined in "check_checkmate"
-        :param board: The current board being used to check positions - should be the same board that the
-        piece's "hypothetical move" took place on
-        :return: True if the general is still in check given the "move" position of the friendly piece. Otherwise,
-        returns False
+        Method that does the work of is_square_attacked on a position given as bitboards, which don't have to be the
+        Board's own - see exposes_general.
+        :param square: the tile to look at, e.g. "e9"
+        :param by_color: the color of the player whose pieces might attack the tile - either "blue" or "red"
+        :param occupied: the bitboard of every tile with a piece on it
+        :param piece_masks: a list of bitboards, indexed by piece code, as returned by the Board's get_piece_masks
+        :return: Returns True if one of the player's pieces could move to the tile, otherwise False
         """
-        tiles = board.get_tiles()
-        general_position = self.find_general(tiles[move], 'friendly', tiles)
-        enemy_pieces = self.get_friendly_or_enemy_pieces(tiles[move], 'enemy', tiles)
+        offset = 0 if by_color == 'blue' else RED
+        bit = SQUARE_BITS[square]
 
-        hypothetical_board = copy.deepcopy(board)
-        if self.first_check(enemy_pieces, general_position, hypothetical_board):
+        # soldiers, generals and guards can't be blocked, so one "and" with the tiles they would have to attack from
+        # is enough
+        if piece_masks[SOLDIER + offset] & ATTACK_SOLDIER_MASKS[by_color][square]:
             return True
+        if (piece_masks[GENERAL + offset] | piece_masks[GUARD + offset]) & ATTACK_PALACE_MASKS[by_color][square]:
+            return True
+
+        # chariots attack along a ray up to the first piece; cannons attack the tile after hopping exactly one
+        # piece, which can't itself be a cannon. Cannons can't capture cannons.
+        chariots = piece_masks[CHARIOT + offset]
+        cannons = piece_masks[CANNON] | piece_masks[CANNON + RED]
+        attacking_cannons = piece_masks[CANNON + offset] if not cannons & bit else 0
+        attackers = chariots | attacking_cannons
+        if attackers:
+            # only the rays with a chariot or cannon on them need looking along
+            for _, mask, step in RAY_MASKS[square]:
+                if not attackers & mask:
+                    continue
+                blockers = occupied & mask
+                nearest = blockers & -blockers if step > 0 else 1 << (blockers.bit_length() - 1)
+                if chariots & nearest:
+                    return True
+                if not attacking_cannons or cannons & nearest:
+                    continue
+                blockers ^= nearest
+                beyond = blockers & -blockers if step > 0 else 1 << (blockers.bit_length() - 1)
+                if attacking_cannons & beyond:
+                    return True
+
+        # horses and elephants attack the tile unless a piece is in the way - only the tiles that actually hold one
+        # need looking at
+        horses, elephants = ATTACK_MAMMAL_MASKS[square]
+        horses &= piece_masks[HORSE + offset]
+        if horses:
+            for origin, leg in ATTACK_HORSES[square]:
+                if horses & (1 << origin) and not occupied & (1 << leg):
+                    return True
+        elephants &= piece_masks[ELEPHANT + offset]
+        if elephants:
+            for origin, leg, middle in ATTACK_ELEPHANTS[square]:
+                if elephants & (1 << origin) and not occupied & ((1 << leg) | (1 << middle)):
+                    return True
+
         return False
 
+    def exposes_general(self, start_position, end_position, board=None):
+        """
+        Method that looks at whether a move would leave the moving player's general open to capture, without making
+        the move. The bitboards the move would leave behind only differ from the Board's in a few bits - the moved
+        piece's tiles, and the captured piece's tile - so they're worked out directly, and the general's tile tested
+        on them with is_attacked_on_bitboards. This is much cheaper than making the move on the board and taking it
+        back again.
+        :param start_position: the tile of the piece being moved
+        :param end_position: the tile the piece is being moved to - must not hold a piece of the same player
+        :param board: the Board object being used - by default, the actual board associated with the Game object
+        :return: True if the player's general would be attacked after the move, otherwise False
+        """
+        if board is None:
+            board = self.get_board()
+        squares = board.get_squares()
+        start_bit = SQUARE_BITS[start_position]
+        end_bit = SQUARE_BITS[end_position]
+        moved = squares[SQUARE_INDEX[start_position]]
+        captured = squares[SQUARE_INDEX[end_position]]
+        color = 'red' if moved & RED else 'blue'
+
+        piece_masks = board.get_piece_masks()[:]
+        piece_masks[moved] ^= start_bit | end_bit
+        if captured != EMPTY:
+            piece_masks[captured] ^= end_bit
+        occupied = (board.get_occupancy() ^ start_bit) | end_bit
+
+        general_position = end_position if moved & ~RED == GENERAL else board.get_general_position(color)
+        return self.is_attacked_on_bitboards(general_position, OPPONENT[color], occupied, piece_masks)
+
+    def find_checks(self, square, by_color, board=None):
+        """
+        Method that finds every one of a player's pieces attacking a given tile, along with the tiles that the
+        attack passes through. It works backwards from the tile in the same way as is_square_attacked, but doesn't
+        stop at the first attacker.
+        :param square: the tile to look at - normally a general's tile
+        :param by_color: the color of the player whose pieces might attack the tile - either "blue" or "red"
+        :param board: the Board object being used - by default, the actual board associated with the Game object
+        :return: a list of (origin, path, screen) tuples, one for each attacking piece, with tiles given by their
+        index in SQUARES - the attacker's tile; the tiles between it and the attacked tile that a piece could block
+        the attack on (the empty tiles along a chariot's or cannon's ray, and a horse's or elephant's leg and middle
+        tiles); and, for a cannon, the tile of the piece it hops over (which is also in the path), otherwise None
+        """
+        if board is None:
+            board = self.get_board()
+        squares = board.get_squares()
+        offset = 0 if by_color == 'blue' else RED
+        checks = []
+
+        chariot = CHARIOT + offset
+        cannon = CANNON + offset if squares[SQUARE_INDEX[square]] not in (CANNON, CANNON + RED) else None
+        for ray in ATTACK_RAYS[square]:
+            screen = None
+            for distance, index in enumerate(ray):
+                code = squares[index]
+                if code == EMPTY:
+                    continue
+                if screen is not None:
+                    if code == cannon:
+                        checks.append((index, ray[:distance], screen))
+                    break
+                if code == chariot:
+                    checks.append((index, ray[:distance], None))
+                    break
+                if code == CANNON or code == CANNON + RED:
+                    break
+                screen = index
+
+        horse = HORSE + offset
+        for origin, leg in ATTACK_HORSES[square]:
+            if squares[origin] == horse and squares[leg] == EMPTY:
+                checks.append((origin, (leg,), None))
+        elephant = ELEPHANT + offset
+        for origin, leg, middle in ATTACK_ELEPHANTS[square]:
+            if squares[origin] == elephant and squares[leg] == EMPTY and squares[middle] == EMPTY:
+                checks.append((origin, (leg, middle), None))
+
+        soldier = SOLDIER + offset
+        for origin in ATTACK_SOLDIERS[by_color][square]:
+            if squares[origin] == soldier:
+                checks.append((origin, (), None))
+
+        general = GENERAL + offset
+        guard = GUARD + offset
+        for origin in ATTACK_PALACE_PIECES[by_color][square]:
+            if squares[origin] == general or squares[origin] == guard:
+                checks.append((origin, (), None))
+
+        return checks
+
+    def find_evasions(self, color, board=None):
+        """
+        Method that lists the moves that could get a player's general out of check, using find_checks to see what
+        the check is. A move can only get the general out of check if it moves the general; captures a checking
+        piece; puts a piece on a tile the check passes through (including capturing a cannon's screen, which may
+        leave the cannon with a cannon to hop over); or moves a cannon's screen away. Every other move leaves the
+        general in check, so only these are listed - far fewer than all of the player's moves. The moves may still
+        leave the general in check, so each one must be tried.
+        :param color: the color of the player in check - either "blue" or "red"
+        :param board: the Board object being used - by default, the actual board associated with the Game object
+        :return: a list of (start_position, end_position) moves
+        """
+        if board is None:
+            board = self.get_board()
+        tiles = board.get_tiles()
+        general_position = board.get_general_position(color)
+
+        targets = set()
+        screens = set()
+        for origin, path, screen in self.find_checks(general_position, OPPONENT[color], board):
+            targets.add(SQUARES[origin])
+            targets.update(SQUARES[index] for index in path)
+            if screen is not None:
+                screens.add(SQUARES[screen])
+
+        moves = [(general_position, end) for end in self.make_general_or_guard_move(general_position, board)]
+        for start in board.get_piece_positions(color):
+            if start == general_position:
+                continue
+            if tiles[start].get_type() == GUARD:
+                possible_moves = self.make_general_or_guard_move(start, board)
+            else:
+                possible_moves = self.get_move_function(start, board)
+            if start in screens:
+                moves.extend((start, end) for end in possible_moves)
+            else:
+                moves.extend((start, end) for end in possible_moves if end in targets)
+        return moves
+
     def is_move_valid(self, start_position, end_position, board=None):
         """
         Method called by the make_move method to determine whether a piece can make the move it wants to make.
@@ -281,55 +1286,45 @@ class JanggiGame:
         would leave the piece's general open to check, which is not allowed and will be determined as an illegal move.
         :param start_position: Same start_position that was passed to make_move
         :param end_position: Same end_position that was passed to make_move
-        :param board: Because this method is also used to validate "hypothetical" moves during checks for check
-        or checkmate, the "board" parameter should represent the board currently being played on. By default, this
-        uses the actual board associated with the Game object.
+        :param board: The Board object to validate the move on. By default, this uses the actual board associated
+        with the Game object. The move is made in place on this board - if it turns out to be invalid, it is taken
+        back again with the Board's "pop" method, so the board is only left changed when the move is valid.
         :return: Returns true if the move is valid, otherwise returns false.
         """
         # set the board being used
         if board is None:
-            hypothetical_board = copy.deepcopy(self.get_board())
-        else:
-            hypothetical_board = copy.deepcopy(board)
+            board = self.get_board()
 
         # create an alias for our piece, once we've set the correct board
-        piece = hypothetical_board.get_tiles()[start_position]
+        piece = board.get_tiles()[start_position]
 
         # if the piece is a general or guard, first we check to make sure that the end position is in the palace
-        if str(piece) == 'general' or str(piece) == 'guard':
+        if piece.get_type() in (GENERAL, GUARD):
             color = piece.get_player().get_color()
-            if end_position not in hypothetical_board.get_palace()[color]:
+            if end_position not in PALACE_SQUARES[color]:
                 # print("piece can't move outside of palace")
                 return False
 
-            possible_moves = self.make_general_or_guard_move(start_position, hypothetical_board.get_tiles())
+            possible_moves = self.make_general_or_guard_move(start_position, board)
 
         else:
-            possible_moves = self.get_move_function(start_position, hypothetical_board.get_tiles())
+            possible_moves = self.get_move_function(start_position, board)
 
         if end_position not in possible_moves:
             # print("not a valid move for this piece")
             return False
         else:
-            # "pretend" to make the move for the piece in question
-            hypothetical_board.set_board_position(end_position, piece)
-            hypothetical_board.set_board_position(start_position, None)
-
-            # now find all the enemy pieces and see whether, given the move made, they can now capture
-            # our general
-            enemy_pieces = self.get_friendly_or_enemy_pieces(piece, 'enemy', hypothetical_board.get_tiles())
-
-            if str(piece) == 'general':
-                general_position = end_position
-            else:
-                general_position = self.find_general(piece, 'friendly', hypothetical_board.get_tiles())
+            # make the move for the piece in question - it's taken back below if it turns out to be illegal
+            board.push(start_position, end_position)
 
-            if self.first_check(enemy_pieces, general_position, hypothetical_board):
-                # if a piece can capture the general, then this move isn't valid
+            # now see whether, given the move made, any enemy piece can capture our general
+            color = piece.get_player().get_color()
+            if self.is_square_attacked(board.get_general_position(color), OPPONENT[color], board):
+                # if a piece can capture the general, then this move isn't valid - take it back
+                board.pop()
                 return False
 
-            # otherwise, the move is valid, and the "pretend" board now becomes the actual board in play
-            self.set_board_and_players(hypothetical_board)
+            # otherwise, the move is valid, and it stays on the board
             return True
 
     def get_move_function(self, position, board):
@@ -337,156 +1332,92 @@ class JanggiGame:
         Method to direct the piece in question to the appropriate "make_x_move" method, to determine what
         possible moves are available given the starting position.
         :param position: The starting position of the piece in question
-        :param board: The board being used to determine the possible moves - may be the actual board or a given
-        "hypothetical board"
+        :param board: The Board object being used to determine the possible moves - may be the actual board or a
+        given "hypothetical board"
         :return: Calls the appropriate make_x_move method and returns that method's return, which is a list of
         valid end positions
         """
-        if str(board[position]) == 'soldier':
+        piece_type = board.get_tiles()[position].get_type()
+        if piece_type == SOLDIER:
             return self.make_soldier_move(position, board)
-        if str(board[position]) == 'horse':
+        if piece_type == HORSE:
             return self.make_horse_move(position, board)
-        if str(board[position]) == 'elephant':
+        if piece_type == ELEPHANT:
             return self.make_elephant_move(position, board)
-        if str(board[position]) == 'cannon':
+        if piece_type == CANNON:
             return self.make_cannon_move(position, board)
-        if str(board[position]) == 'chariot':
+        if piece_type == CHARIOT:
             return self.make_chariot_move(position, board)
 
     def make_general_or_guard_move(self, start, board):
         """
         Because the general and guard have the same move structure, their "make_x_move" method is the same
         :param start: the starting position of the piece to generate possible moves for
-        :param board: the board being used to determine the possible moves - may be the actual board or a given
-        "hypothetical board"
+        :param board: the Board object being used to determine the possible moves - may be the actual board or a
+        given "hypothetical board"
         :return: A list of board positions that it is valid for the piece to move to, given their starting location
         """
-        piece = board[start]
-        # reset the piece's basic moves from their new position
-        piece.set_basic_moves(start)
-        # get the newly generated basic moves
-        basic_moves = piece.get_basic_moves()
-
-        on_board = [move for move in basic_moves if move in board]
-
-        # for generals and guards, all end positions need to be in the palace
-        in_palace = [move for move in on_board if move in self.get_board().get_palace()[piece.get_player().get_color()]]
-
-        # if the end position contains a friendly piece, remove it from the list of possible moves
-        not_blocked = [move for move in in_palace if board[move] is None or board[move].get_player()
-                       != piece.get_player()]
+        piece = board.get_tiles()[start]
+        friendly = board.get_occupancy(piece.get_player().get_color())
 
-        return not_blocked
+        # the basic moves already keep the piece inside its palace, so we only need to remove any end position that
+        # contains a friendly piece
+        return [move for move in piece.get_basic_moves(start) if not friendly & SQUARE_BITS[move]]
 
     def make_soldier_move(self, start, board):
         """
         Method that uses the logic of how a soldier piece can move to generate a list of possible moves from a
         starting position for a given soldier piece.
         :param start: the starting position of the soldier
-        :param board: the board being used to determine the possible moves - may be the actual board or a given
-        "hypothetical board"
+        :param board: the Board object being used to determine the possible moves - may be the actual board or a
+        given "hypothetical board"
         :return: A list of board positions that it is valid for the piece to move to, given their starting location
         """
-        piece = board[start]
-        piece.set_orthogonals(start)
-        piece.set_basic_moves()
-        basic_moves = piece.get_basic_moves()
-
-        # Because the soldier can move differently in the palace, we have to check to see whether it is currently
-        # in the palace, at a position where it could move diagonally
-        if start in self.get_board().get_palace()['diagonals']:
-            piece.set_diagonals(start)
-            diagonal_moves = piece.get_diagonals_in_palace()
-            if piece.get_player().get_color() == 'blue':
-                # soldiers can't move backwards, so it's only possible for them to end up in the opposite palace
-                # not their own
-                in_palace = [move for move in diagonal_moves if move in self.get_board().get_palace()['red']]
-                # but we still need to make sure that they aren't moving backwards with their diagonal move
-                not_backwards = [move for move in in_palace if move[1] < start[1]]
-            else:
-                in_palace = [move for move in diagonal_moves if move in self.get_board().get_palace()['blue']]
-                not_backwards = [move for move in in_palace if move[1] > start[1]]
-            basic_moves = not_backwards + basic_moves
-
-        on_board = [move for move in basic_moves if move in board]
-        not_blocked = [move for move in on_board if board[move] is None or board[move].get_player() !=
-                       piece.get_player()]
+        piece = board.get_tiles()[start]
+        friendly = board.get_occupancy(piece.get_player().get_color())
 
-        return not_blocked
+        # the basic moves include the diagonal moves a soldier can make along the lines of the enemy palace, so we
+        # only need to remove any end position that contains a friendly piece
+        return [move for move in piece.get_basic_moves(start) if not friendly & SQUARE_BITS[move]]
 
     def make_cannon_move(self, start, board):
         """
         Method that uses the logic of how a cannon piece can move to generate a list of possible moves from a
         starting position for a given cannon piece.
         :param start: the starting position of the cannon
-        :param board: the board being used to determine the possible moves - may be the actual board or a given
-        "hypothetical board"
+        :param board: the Board object being used to determine the possible moves - may be the actual board or a
+        given "hypothetical board"
         :return: A list of board positions that it is valid for the piece to move to, given their starting location
         """
-        piece = board[start]
-        piece.set_basic_moves(start)
-
-        # if there are no basic moves for a direction, or if there's just one (because the cannon has to hop
-        # over a piece), remove that direction from the list to be checked.
-        basic_moves = [sublist for sublist in piece.get_basic_moves() if sublist != [] and len(sublist) > 1]
-
+        friendly = board.get_occupancy(board.get_tiles()[start].get_player().get_color())
+        occupied = board.get_occupancy()
+        piece_masks = board.get_piece_masks()
+        cannons = piece_masks[CANNON] | piece_masks[CANNON + RED]
+        start_index = SQUARE_INDEX[start]
         moves = []
 
-        # this loop is a bit complex, but basically we're just checking to see whether, for a given direction
-        # a piece contains another piece. If it does, we count that as our "hopped" piece, and each position
-        # after that is a valid move for the cannon until another piece is encountered. If that piece is friendly
-        # then the cannon can move UP to that position; if it's an enemy piece, the cannon can move up to and
-        # INCLUDING that position
-        for direction in basic_moves:
-            index = 1
-            hopped = 0
-            while index < len(direction) and hopped <= 1:
-                if board[direction[index]] is None:
-                    if direction[index - 1] in moves:
-                        moves.append(direction[index])
-                    elif board[direction[index - 1]] is not None and str(board[direction[index - 1]]) != 'cannon':
-                        moves.append(direction[index])
-                        if hopped == 0:
-                            hopped += 1
-                elif board[direction[index]].get_player() != piece.get_player() and \
-                        str(board[direction[index]]) != 'cannon':
-                    if board[direction[index - 1]] is not None and str(board[direction[index - 1]]) != 'cannon':
-                        if hopped == 1 or index == 1:
-                            moves.append(direction[index])
-                            hopped += 1
-                    else:
-                        if hopped == 1:
-                            moves.append(direction[index])
-                            hopped += 1
-                        else:
-                            hopped += 1
-                elif board[direction[index]].get_player() == piece.get_player():
-                    if board[direction[index - 1]] is not None:
-                        hopped += 2
-                    else:
-                        hopped += 1
-                index += 1
-
-        # if the cannon is in the palace on a diagonal, then it also has the potential to move diagonally
-        if start in self.get_board().get_palace()['blue'] or self.get_board().get_palace()['red']:
-            if start in self.get_board().get_palace()['blue']:
-                palace = self.get_board().get_palace()['blue']
+        # the cannon looks along each of its rays (including any palace diagonals) for a piece to hop over - the
+        # nearest of the ray's occupied tiles. If that first piece is another cannon, the cannon can't go any further
+        # in that direction. Otherwise, each empty position after it is a valid move until the next piece along the
+        # ray - if that piece is an enemy, and not a cannon, the cannon can move up to and INCLUDING that position
+        for ray, mask, step in RAY_MASKS[start]:
+            blockers = occupied & mask
+            if not blockers:
+                continue
+            screen = lowest_index(blockers) if step > 0 else highest_index(blockers)
+            if cannons & (1 << screen):
+                continue
+            beyond = (screen - start_index) // step
+            blockers ^= 1 << screen
+            if not blockers:
+                moves.extend(ray[beyond:])
+                continue
+            target = lowest_index(blockers) if step > 0 else highest_index(blockers)
+            distance = (target - start_index) // step
+            if (friendly | cannons) & (1 << target):
+                moves.extend(ray[beyond:distance - 1])
             else:
-                palace = self.get_board().get_palace()['red']
-
-            diagonals = [palace[0], palace[2], palace[6], palace[8]]
-            if start in diagonals:
-                piece.set_palace_diagonals(start)
-                in_palace = [space for space in piece.get_diagonals() if space in palace]
-
-                # here we check to see if the first diagonal contains a non-cannon piece and if the second diagonal
-                # is empty or contains an non-cannon enemy. If both conditions are met,
-                # the cannon can move diagonally
-
-                if (board[in_palace[0]] is not None and str(board[in_palace[0]]) != 'cannon') and \
-                    (board[in_palace[1]] is None or board[in_palace[1]].get_player() != piece.get_player()) and \
-                        str(board[in_palace[1]]) != 'cannon':
-                    moves.append(in_palace[1])
+                moves.extend(ray[beyond:distance])
         return moves
 
     def make_chariot_move(self, start, board):
@@ -494,62 +1425,30 @@ class JanggiGame:
         Method that uses the logic of how a chariot piece can move to generate a list of possible moves from a
         starting position for a given chariot piece.
         :param start: the starting position of the chariot
-        :param board: the board being used to determine the possible moves - may be the actual board or a given
-        "hypothetical board"
+        :param board: the Board object being used to determine the possible moves - may be the actual board or a
+        given "hypothetical board"
         :return: A list of board positions that it is valid for the piece to move to, given their starting location
         """
-        piece = board[start]
-        piece.set_basic_moves(start)
-        basic_moves = [sublist for sublist in piece.get_basic_moves() if sublist != []]
-        not_blocked = []
-
-        # here, we loop through each direction to see how far the cannon can move until it hits another piece.
-        # All of the empty spaces are counted as moves, and, if the piece is an enemy, that space is also counted.
-        for direction in basic_moves:
-            index = 0
-            while index < len(direction):
-                if board[direction[index]] is None:
-                    if index == len(direction) - 1:
-                        not_blocked += direction
-                    index += 1
-                elif board[direction[index]].get_player() != piece.get_player():
-                    if index != len(direction) - 1:
-                        not_blocked += direction[0:index + 1]
-                        break
-                    else:
-                        not_blocked += direction
-                        break
-                else:
-                    not_blocked += direction[0:index]
-                    break
+        friendly = board.get_occupancy(board.get_tiles()[start].get_player().get_color())
+        occupied = board.get_occupancy()
+        start_index = SQUARE_INDEX[start]
+        moves = []
 
-        # if the chariot is in the palace, it can move diagonally along the diagonal lines.
-        if start in self.get_board().get_palace()['blue'] or self.get_board().get_palace()['red']:
-            if start in self.get_board().get_palace()['blue']:
-                palace = self.get_board().get_palace()['blue']
+        # here, we find the nearest piece along each of the chariot's rays (including any palace diagonals) to see
+        # how far it can move. All of the empty spaces before it are counted as moves, and, if the piece is an enemy,
+        # that space is also counted. A ray without any pieces on it can be taken whole.
+        for ray, mask, step in RAY_MASKS[start]:
+            blockers = occupied & mask
+            if not blockers:
+                moves.extend(ray)
+                continue
+            nearest = lowest_index(blockers) if step > 0 else highest_index(blockers)
+            distance = (nearest - start_index) // step
+            if friendly & (1 << nearest):
+                moves.extend(ray[:distance - 1])
             else:
-                palace = self.get_board().get_palace()['red']
-
-            if start in [palace[0], palace[2], palace[4], palace[6], palace[8]]:
-                piece.set_palace_diagonals(start)
-                diagonals = piece.get_diagonals()
-                in_palace = [space for space in diagonals if space in palace]
-
-                # here we check to see if the first diagonal is valid, and, if it is, whether the second diagonal
-                # is valid or not.
-                index = 0
-                while index < len(in_palace):
-                    if board[in_palace[index]] is not None:
-                        if board[in_palace[index]].get_player() != piece.get_player() and index != len(in_palace) - 1:
-                            del in_palace[index + 1]
-                            index += 1
-                        elif board[in_palace[index]].get_player() == piece.get_player():
-                            del in_palace[index]
-                            index += 1
-                    index += 1
-
-                not_blocked += in_palace
-        return not_blocked
+                moves.extend(ray[:distance])
+        return moves
 
     def make_mammal_move(self, start, board):
         """
@@ -557,133 +1456,91 @@ class JanggiGame:
         be blocked by another piece being in their starting orthogonal move, this method checks each orthogonal
         direction from an elephant's or horse's starting position and removes that direction if it finds it blocked.
         :param start: the starting position of the horse or elephant
-        :param board: the board being used to determine the possible moves - may be the actual board or a given
-        "hypothetical board"
+        :param board: the Board object being used to determine the possible moves - may be the actual board or a
+        given "hypothetical board"
         :return: The list of directions for the piece to move, with any directions blocked orthogonally removed
         """
-        piece = board[start]
-        if str(piece) == 'horse':
-            piece.set_basic_moves(1)
-        else:
-            piece.set_elephant_moves()
-
-        basic_moves = [direction for direction in piece.get_basic_moves() if direction[0] in board]
-        not_blocked = []
-
-        for direction in basic_moves:
-            if board[direction[0]] is None:
-                not_blocked.append(direction)
-
-        return not_blocked
+        # each direction starts with the orthogonal tile the piece has to step onto first - if there's a piece
+        # there, the whole direction is blocked
+        occupied = board.get_occupancy()
+        return [direction for direction in board.get_tiles()[start].get_basic_moves(start)
+                if not occupied & SQUARE_BITS[direction[0]]]
 
     def make_horse_move(self, start, board):
         """
         Method that uses the logic of how a horse piece can move to generate a list of possible moves from a
         starting position for a given horse piece.
         :param start: the starting position of the horse
-        :param board: the board being used to determine the possible moves - may be the actual board or a given
-        "hypothetical board"
+        :param board: the Board object being used to determine the possible moves - may be the actual board or a
+        given "hypothetical board"
         :return: A list of board positions that it is valid for the piece to move to, given their starting location
         """
-        not_blocked_first = self.make_mammal_move(start, board)
-
-        only_diagonals = []
-
-        # here we strip the orthogonal space and create a list of only the diagonal moves (end positions)
-        for direction in not_blocked_first:
-            for item in direction[1]:
-                only_diagonals.append(item)
-
-        # for each diagonal, we make sure that it's on the board and it's not blocked by a friendly piece
-        for space in only_diagonals:
-            if space not in board:
-                only_diagonals.remove(space)
-            elif board[space] is not None and board[space].get_player() == board[start].get_player():
-                only_diagonals.remove(space)
+        friendly = board.get_occupancy(board.get_tiles()[start].get_player().get_color())
+        moves = []
 
-        return only_diagonals
+        # for each diagonal at the end of an open direction, we make sure it's not blocked by a friendly piece
+        for _, ends in self.make_mammal_move(start, board):
+            for end in ends:
+                if not friendly & SQUARE_BITS[end]:
+                    moves.append(end)
+        return moves
 
     def make_elephant_move(self, start, board):
         """
         Method that uses the logic of how an elephant piece can move to generate a list of possible moves from a
         starting position for a given elephant piece.
         :param start: the starting position of an elephant
-        :param board: the board being used to determine the possible moves - may be the actual board or a given
-        "hypothetical board"
+        :param board: the Board object being used to determine the possible moves - may be the actual board or a
+        given "hypothetical board"
         :return: A list of board positions that it is valid for the piece to move to, given their starting location
         """
-        not_blocked_first = self.make_mammal_move(start, board)
-        only_diagonals = []
-        final_moves = []
-
-        # here we strip the orthogonal space and create a list of only the diagonal moves (end positions)
-        for direction in not_blocked_first:
-            only_diagonals.append(direction[1])
-            only_diagonals.append(direction[2])
-
-        # for each diagonal, we make sure that it's on the board and it's empty (not blocked)
-        for diagonal in only_diagonals:
-            first_diagonal = diagonal[0] in board
-            second_diagonal = diagonal[1] in board
-
-            if first_diagonal and second_diagonal:
-                if board[diagonal[0]] is None:
-                    final_moves.append(diagonal)
-
-        # for the final diagonal, we make sure that it's either empty or contains an enemy piece
-        final_moves = [item[1] for item in final_moves if board[item[1]] is None or
-                       board[item[1]].get_player() != board[start].get_player()]
+        friendly = board.get_occupancy(board.get_tiles()[start].get_player().get_color())
+        occupied = board.get_occupancy()
+        moves = []
 
-        return final_moves
+        # for each path along an open direction, the first diagonal has to be empty, and the final diagonal either
+        # empty or holding an enemy piece
+        for _, paths in self.make_mammal_move(start, board):
+            for middle, end in paths:
+                if not occupied & SQUARE_BITS[middle] and not friendly & SQUARE_BITS[end]:
+                    moves.append(end)
+        return moves
 
-    def find_general(self, piece, friendly_or_enemy, board):
+    def find_general(self, piece, friendly_or_enemy, board=None):
         """
-        Method to locate the friendly or enemy general when determining check or checkmate
+        Method to locate the friendly or enemy general when determining check or checkmate. The Board keeps track of
+        where both generals are as pieces move, so this is a lookup rather than a search of the tiles.
         :param piece: the piece to use to find the general
         :param friendly_or_enemy: whether we should look for the general OF the given piece, or the ENEMY general
         of the given piece
-        :param board: the board being used to determine the possible moves - may be the actual board or a given
-        "hypothetical board"
+        :param board: the Board object being used - by default, the actual board associated with the Game object
         :return: The single board tile that the general is on, e.g., "e2"
         """
-        for tile in board:
-            if friendly_or_enemy == 'friendly':
-                if str(board[tile]) == 'general' and board[tile].get_player() == piece.get_player():
-                    return tile
-            else:
-                if str(board[tile]) == 'general' and board[tile].get_player() != piece.get_player():
-                    return tile
+        if board is None:
+            board = self.get_board()
+        color = piece.get_player().get_color()
+        if friendly_or_enemy != 'friendly':
+            color = OPPONENT[color]
+        return board.get_general_position(color)
 
-    def get_friendly_or_enemy_pieces(self, piece_in_question, friendly_or_enemy, board):
+    def get_friendly_or_enemy_pieces(self, piece_in_question, friendly_or_enemy, board=None):
         """
         Method to generate a list of the positions of all pieces friendly to or enemies of the given starting
-        piece. This is used during check/checkmate to run through all friendly/enemy pieces and see whether they
-        can capture a given general.
+        piece. The Board keeps a set of the tiles each player's pieces are on, so this only has to copy that set
+        rather than search every tile.
         :param piece_in_question: the piece to use a starting place (to either find pieces friendly to it or its
         enemies)
         :param friendly_or_enemy: signifies whether you want to find pieces friendly to the starting piece, or
         that piece's enemies
-        :param board: the board being used to determine the possible moves - may be the actual board or a given
-        "hypothetical board"
+        :param board: the Board object being used - by default, the actual board associated with the Game object
         :return: A list of board tiles where friendly/enemy pieces were found
         """
-
-        friendly_or_enemy_pieces = []
-
-        for tile in board:
-            if board[tile] is not None:
-                enemy = board[tile].get_player() != piece_in_question.get_player()
-                friendly = board[tile].get_player() == piece_in_question.get_player()
-
-                if friendly_or_enemy == 'friendly':
-                    if friendly:
-                        friendly_or_enemy_pieces.append(tile)
-
-                else:
-                    if enemy:
-                        friendly_or_enemy_pieces.append(tile)
-
-        return friendly_or_enemy_pieces
+        if board is None:
+            board = self.get_board()
+        color = piece_in_question.get_player().get_color()
+        if friendly_or_enemy != 'friendly':
+            color = OPPONENT[color]
+        return list(board.get_piece_positions(color))
 
 
 class Player:
@@ -691,8 +1548,11 @@ class Player:
     A class that creates Player objects to associate with the Game class and various Piece classes. Each
     Piece object is tied to a Player object, so that it's possible to distinguish between which "side" a piece
     is on. In this program, Player objects are initially created by the Game object, then passed to the Board object
-    (also created by the Game object), which, in turn, ties the Player object to a created Piece object.
+    (also created by the Game object), which, in turn, ties the Player object to a created Piece object. Like the
+    pieces, its attributes are declared in __slots__, so it carries no instance dictionary.
     """
+    __slots__ = ('_in_check', '_turn', '_color')
+
     def __init__(self, turn):
         """
         Initialization method for the Player class. When the Players are created for the first time, blue is given
@@ -745,12 +1605,11 @@ class Player:
 
 class Board:
     """
-    The "Board" class is responsible for keeping track of the location of each piece, and for governing the limits
-    of the board's "palace". It is created by a particular instance of the Game class and, in turn, creates each
-    Piece object that will be used in the game. The Game object will repeatedly ask the Board for information regarding
-    where different pieces are located on the board and whether or not a particular piece is inside or outside of the
-    board's "palace" zone. The Game object will also use the Board to find the locations of all pieces currently
-    causing a "check" condition in the game.
+    The "Board" class is responsible for keeping track of the location of each piece. It is created by a particular
+    instance of the Game class and, in turn, creates each Piece object that will be used in the game. The Game object
+    will repeatedly ask the Board for information regarding where different pieces are located on the board, and will
+    also use the Board to find the locations of all pieces currently causing a "check" condition in the game. The
+    tiles of each palace are the same for every board, so they are kept in the module's PALACE_SQUARES dictionary.
 
     Because the Board creates the necessary Piece objects for a particular game, it must also have knowledge of the
     Player objects created for that game. The Game object will pass these objects to the Board object on creation, and
@@ -761,20 +1620,29 @@ class Board:
         """
         Initializes the Board object to be used alongside the Game object that created it. Initializes a "players"
         dictionary that is the same as the Game's player dictionary, to be used to pass Player objects to each Piece
-        object. Also initializes a "palace" attribute that defines which tiles on the board qualify as the "palace",
-        and a "tiles" attribute. The "tiles" attribute is a dictionary that contains the board tiles as keys
+        object. Also initializes a "tiles" attribute, which is a dictionary that contains the board tiles as keys
         and creates Piece objects as the key's value. If no piece is currently associated with a tile,
         that key's value is None.
         :param player_dictionary: the dictionary created as the associated Game object's "players" attribute; used
         to initialize the same value in the Board class so that Piece objects have access to the same Player objects
         as the Game
+
+        The same position is also kept in a "squares" attribute - a flat list of the 90 tiles, in the order of the
+        module's SQUARES tuple, holding the code of the piece on each tile (or EMPTY). The "pieces" attribute holds the
+        set of tiles each player has pieces on (a dictionary used as an ordered set, so that it's always walked in the
+        same order), and the "generals" attribute the tile each player's general is on; both are kept up to date as
+        pieces move, so the Game object never has to search the board for them. The position is kept a third time as
+        bitboards (see SQUARE_BITS): the "occupancy" attribute holds the tiles of each player's pieces, and the
+        "piece_masks" attribute the tiles of each kind of piece, indexed by piece code, so that the Game object can test
+        a whole ray or set of tiles at once when generating moves and looking for attacks. The "hash_key" attribute is
+        the position's 64-bit Zobrist key (see make_zobrist_keys), which is updated as pieces move and as the turn
+        changes. A "move_stack" attribute keeps every move made with the "push" method, along with the piece it
+        captured (if any), so that the move can be taken back again with the "pop" method. Finally, a "piece_objects"
+        attribute holds the Piece objects the "reset" method puts back on the board, once it has been called, and an
+        "instrumentation" attribute the board's counts, once instrumentation has been enabled (see
+        enable_instrumentation).
         """
         self._players = player_dictionary
-        self._palace = {
-            'red': ['d1', 'd2', 'd3', 'e1', 'e2', 'e3', 'f1', 'f2', 'f3'],
-            'blue': ['d10', 'd9', 'd8', 'e10', 'e9', 'e8', 'f10', 'f9', 'f8'],
-            'diagonals': ['d1', 'f1', 'e2', 'd3', 'f3', 'd8', 'f8', 'e9', 'd10', 'f10']
-        }
         self._tiles = {
             'd8': None,
             'd9': None,
@@ -868,6 +1736,53 @@ class Board:
             'i10': Chariot('i10', self._players['blue']),
 
         }
+        self._squares = [EMPTY] * 90
+        self._pieces = {'blue': {}, 'red': {}}
+        self._generals = {'blue': None, 'red': None}
+        self._occupancy = {'blue': 0, 'red': 0}
+        self._piece_masks = [0] * (RED + SOLDIER + 1)
+        self._hash_key = 0
+        for square, piece in self._tiles.items():
+            if piece is not None:
+                self._squares[SQUARE_INDEX[square]] = piece.get_code()
+                self.add_to_indices(square, piece)
+        self._move_stack = []
+        self._piece_objects = None
+        self._instrumentation = None
+
+    def reset(self, template=None):
+        """
+        Sets the board back to the starting position by copying another board's position - by default, the module's
+        STARTING_BOARD, made when the module is imported. The flat list of tiles, piece indices, bitboards and position
+        key don't depend on which game the pieces belong to, so they're copied as they are; the tiles get Piece objects
+        of this board's own players. A piece holds nothing but its player and its code, so one Piece object of each
+        code is made, the first time the board is reset, and shared by every tile that piece is on. The move stack is
+        emptied, and so are the board's instrumentation counts. The position key is copied too, so it's only right if
+        the template has the same player to move.
+        :param template: the Board object to copy the position of
+        :return: None
+        """
+        if template is None:
+            template = STARTING_BOARD
+        if self._piece_objects is None:
+            self._piece_objects = [None] * (RED + SOLDIER + 1)
+            for code in range(GENERAL, SOLDIER + 1):
+                self._piece_objects[code] = PIECE_CLASSES[code](None, self._players['blue'])
+                self._piece_objects[code + RED] = PIECE_CLASSES[code](None, self._players['red'])
+
+        piece_objects = self._piece_objects
+        tiles = self._tiles
+        for square, code in zip(SQUARES, template._squares):
+            tiles[square] = piece_objects[code]
+        self._squares[:] = template._squares
+        for color in ('blue', 'red'):
+            self._pieces[color] = dict(template._pieces[color])
+        self._generals = dict(template._generals)
+        self._occupancy = dict(template._occupancy)
+        self._piece_masks[:] = template._piece_masks
+        self._hash_key = template._hash_key
+        self._move_stack = []
+        self._instrumentation = None
 
     def get_tiles(self):
         """
@@ -875,12 +1790,84 @@ class Board:
         """
         return self._tiles
 
-    def get_palace(self):
+    def get_squares(self):
+        """
+        Returns the Board's flat list of tiles - the code of the piece on each of the 90 tiles, indexed by the
+        module's SQUARE_INDEX, or EMPTY where a tile has no piece on it.
+        """
+        return self._squares
+
+    def get_position_bytes(self):
+        """
+        Returns the Board's flat list of tiles as a bytes object, one piece code per tile
+        """
+        return bytes(self._squares)
+
+    def set_position_bytes(self, codes):
+        """
+        Sets up the board as given by a list of piece codes - one per tile, in the order of the module's SQUARES
+        tuple. Only the tiles whose code differs are changed, each getting a new Piece object (or None), so setting up
+        a position close to the current one is quick. The move stack is emptied, since its moves may no longer make
+        sense on the new position; the position key is kept up to date as usual, keeping its side to move.
+        :param codes: 90 piece codes, e.g. as returned by get_position_bytes
+        :return: None
+        """
+        self._move_stack = []
+        squares = self._squares
+        for index, code in enumerate(codes):
+            if squares[index] != code:
+                if code == EMPTY:
+                    self.set_board_position(SQUARES[index], None)
+                else:
+                    player = self._players['red' if code & RED else 'blue']
+                    self.set_board_position(SQUARES[index], PIECE_CLASSES[code & ~RED](SQUARES[index], player))
+
+    def get_occupancy(self, color=None):
+        """
+        Returns the bitboard of the tiles the given player has pieces on (see SQUARE_BITS)
+        :param color: the color of the player - either "blue" or "red". By default, the tiles of both players.
+        """
+        if color is None:
+            return self._occupancy['blue'] | self._occupancy['red']
+        return self._occupancy[color]
+
+    def get_piece_masks(self):
+        """
+        Returns the Board's list of bitboards, indexed by piece code, of the tiles each kind of piece is on - e.g.
+        get_piece_masks()[CANNON + RED] holds red's cannons. This is the Board's own list, which changes as pieces
+        move.
+        """
+        return self._piece_masks
+
+    def get_piece_positions(self, color):
+        """
+        Returns the set of tiles that the given player has pieces on. This is the Board's own set, which changes as
+        pieces move - copy it before moving pieces while walking through it.
+        :param color: the color of the player - either "blue" or "red"
+        """
+        return self._pieces[color]
+
+    def get_general_position(self, color):
         """
-        Returns the list of tiles that define the palace. Used by the Game class to determine whether a Piece
-        is currently in or out of the palace, because that determines some pieces' movement logic.
+        Returns the tile the given player's general is on, or None if the general isn't on the board
+        :param color: the color of the player - either "blue" or "red"
         """
-        return self._palace
+        return self._generals[color]
+
+    def hash_key(self):
+        """
+        Returns the 64-bit key of the current position - the pieces on every tile and whose turn it is. Two
+        positions with the same key can be treated as the same position.
+        """
+        return self._hash_key
+
+    def switch_side_key(self):
+        """
+        Updates the position key for the turn passing to the other player - called by the Game object whenever it
+        updates the turn
+        :return: None
+        """
+        self._hash_key ^= ZOBRIST_RED_TO_MOVE
 
     def get_players(self):
         """
@@ -888,6 +1875,19 @@ class Board:
         """
         return self._players
 
+    def get_instrumentation(self):
+        """
+        Returns the Board's Instrumentation object, or None if none of its instrumented methods have run
+        """
+        return self._instrumentation
+
+    def get_move_stack(self):
+        """
+        Returns the list of moves made with "push" that haven't been taken back, as (start, end, captured) tuples,
+        oldest first
+        """
+        return self._move_stack
+
     def set_board_position(self, new, piece_or_none):
         """
         Sets a new value at the given tile. Once a piece moves, the Game object will call this method twice - once to
@@ -898,10 +1898,84 @@ class Board:
         :param piece_or_none: Either the Piece object that should be associated with the given tile, or "None", which
         means that the tile is now empty
         :return: None
+
+        The Board's other records of the position - its flat list of tiles, piece indices, bitboards and position
+        key - are all updated here, so they never disagree with the tiles.
         """
+        if self._tiles[new] is not None:
+            self.remove_from_indices(new, self._tiles[new])
         self._tiles[new] = piece_or_none
         if piece_or_none is not None:
-            piece_or_none.set_orthogonals(new)
+            self._squares[SQUARE_INDEX[new]] = piece_or_none.get_code()
+            self.add_to_indices(new, piece_or_none)
+        else:
+            self._squares[SQUARE_INDEX[new]] = EMPTY
+
+    def add_to_indices(self, square, piece):
+        """
+        Records that a piece is now on a tile in the Board's "pieces" and "generals" attributes and in its bitboards,
+        and adds it to the position key
+        :param square: the tile the piece is on
+        :param piece: the Piece object on the tile
+        :return: None
+        """
+        color = piece.get_player().get_color()
+        code = piece.get_code()
+        index = SQUARE_INDEX[square]
+        self._pieces[color][square] = None
+        if code & ~RED == GENERAL:
+            self._generals[color] = square
+        self._occupancy[color] |= 1 << index
+        self._piece_masks[code] |= 1 << index
+        self._hash_key ^= ZOBRIST_PIECES[code][index]
+
+    def remove_from_indices(self, square, piece):
+        """
+        Records that a piece is no longer on a tile in the Board's "pieces" and "generals" attributes and in its
+        bitboards, and takes it out of the position key. During a move, the piece has already been placed on its new
+        tile by the time its old tile is cleared, so a general's position is only forgotten if it is still the tile
+        being cleared.
+        :param square: the tile the piece was on
+        :param piece: the Piece object that was on the tile
+        :return: None
+        """
+        color = piece.get_player().get_color()
+        code = piece.get_code()
+        del self._pieces[color][square]
+        if code & ~RED == GENERAL and self._generals[color] == square:
+            self._generals[color] = None
+        index = SQUARE_INDEX[square]
+        self._occupancy[color] ^= 1 << index
+        self._piece_masks[code] ^= 1 << index
+        self._hash_key ^= ZOBRIST_PIECES[code][index]
+
+    def push(self, start, end):
+        """
+        Makes a move in place on the board - the piece on the start tile is moved to the end tile, capturing whatever
+        was there. The move and the captured piece are kept on the board's "move_stack", so that the move can be
+        taken back with "pop". This is what the Game object uses to try out "hypothetical" moves, e.g. when validating
+        a move, instead of copying the whole board.
+        :param start: The tile of the piece being moved - e.g., "a4"
+        :param end: The tile the piece is being moved to - must be a tile on the board
+        :return: The Piece object that was captured by the move, or None if the end tile was empty
+        """
+        piece = self._tiles[start]
+        captured = self._tiles[end]
+        self.set_board_position(end, piece)
+        self.set_board_position(start, None)
+        self._move_stack.append((start, end, captured))
+        return captured
+
+    def pop(self):
+        """
+        Takes back the last move made with "push" - the moved piece goes back to its start tile, and any piece it
+        captured is put back on the end tile.
+        :return: A tuple of the start tile, end tile and captured Piece object (or None) of the move taken back
+        """
+        start, end, captured = self._move_stack.pop()
+        self.set_board_position(start, self._tiles[end])
+        self.set_board_position(end, captured)
+        return start, end, captured
 
 
 class Piece:
@@ -909,42 +1983,34 @@ class Piece:
     The parent "Piece" class is responsible for determining the starting movement logic of a piece, given
     no restraints - i.e., if a board or other pieces didn't exist, which general directions could a piece move in?
 
-    The parent class contains attributes general to all of the child classes: the player
-    to which the piece belongs, and the basic orthogonal moves of that piece given the current value of its position
-    attribute.
-
-    It also contains a method for determining basic diagonals, which is used in different ways by separate piece
-    types.
+    The parent class contains the attributes general to all of the child classes: the player to which the piece
+    belongs, and the code the Board stores for it. Nothing about where a piece could move is kept on the piece itself -
+    that depends only on the piece's type, its color and the tile it's on, so each child class looks its basic moves up
+    in one of the module's shared move tables (PALACE_MOVES, SOLDIER_MOVES, HORSE_MOVES, ELEPHANT_MOVES or
+    ROLLING_RAYS) with its get_basic_moves method, which takes the tile the piece is on. These are "basic" moves in the
+    sense that they don't take into consideration other pieces, only the piece's movement logic and the edges of the
+    board. The attributes are declared in __slots__, so a piece carries no instance dictionary either, which
+    keeps the many pieces held by stored games small and cheap to copy.
 
     Piece objects are created by the Board object (created, in turn, by the Game object), with knowledge of their
     position on the board's tiles and knowledge of which Player object they are bound to. The Game object communicates
     with Piece objects through the intermediary of the Board object to determine move, check/checkmate, and player
     mechanics.
     """
+    __slots__ = ('_player', '_code')
+
     def __init__(self, position, player):
         """
-        Initialization method for the Piece class - sets the Piece's "player" value, "basic_moves"
-        value, and four orthogonal values - "left", "right", "up", "down". These are separate attributes from the
-        "basic_moves" value, because the subclasses of Piece use these orthogonal directions in their own methods
-        in varying ways (for example, using left to calculate a diagonal from that position).
+        Initialization method for the Piece class - sets the Piece's "player" value and its "code". The starting
+        position isn't stored, since the Board already keeps track of where every piece is.
         :param position: the starting tile of the Piece - should be a tile on the Board
         :param player: the Player object that the piece should be associated to
         """
         self._player = player
-        self._basic_moves = []
-
-        self._left_move = chr(ord(position[0]) - 1) + position[1:]
-        self._right_move = chr(ord(position[0]) + 1) + position[1:]
-        self._down_move = position[0] + str(int(position[1:]) - 1)
-        self._up_move = position[0] + str(int(position[1:]) + 1)
-
-    def get_basic_moves(self):
-        """
-        Returns the list of basic moves (set based on the current position of the piece). These are "basic" moves
-        in the sense that they don't take into consideration the board or other pieces, only the piece's movement
-        logic.
-        """
-        return self._basic_moves
+        if player.get_color() == 'blue':
+            self._code = self._type
+        else:
+            self._code = self._type + RED
 
     def get_player(self):
         """
@@ -952,69 +2018,31 @@ class Piece:
         """
         return self._player
 
-    def set_orthogonals(self, position):
+    def get_type(self):
         """
-        Whenever the piece gets a new position, the orthogonal direction values are reset
-        using that new position as the base, so that Game is always getting the most up-to-date information on
-        where a piece can move.
-        :param position: the new_position associated to the Piece (the new tile on the board)
-        :return: None
+        Returns the piece type - one of the module's GENERAL, GUARD, ELEPHANT, HORSE, CHARIOT, CANNON or SOLDIER
         """
-        self._left_move = chr(ord(position[0]) - 1) + position[1:]
-        self._right_move = chr(ord(position[0]) + 1) + position[1:]
-        self._down_move = position[0] + str(int(position[1:]) - 1)
-        self._up_move = position[0] + str(int(position[1:]) + 1)
-
-    def diagonals(self, position, spaces):
-        """
-        Method that finds and returns the diagonal positions that a piece can move given the provided position -
-        finds the up-left, up-right, down-left, and down-right diagonals the number of spaces away from the starting
-        position as determined by the "spaces" parameter.
-
-        This method is used by a number of subclasses as a starting point for determining a piece's possible moves
-        in a given direction or in special circumstances. For example, the Soldier class uses this to find the
-        up-left and up-right diagonals it can move to while in the palace.
-        :param position: current position of the piece
-        :param spaces: the number of tiles to move diagonally
-        :return: a list of the 4 diagonal spaces from the provided position
-        """
-        if self._player.get_color() == 'blue':
-            up_left_diagonal = chr(ord(position[0]) - spaces) + str(int(position[1:]) + spaces)
-            down_left_diagonal = chr(ord(position[0]) - spaces) + str(int(position[1:]) - spaces)
-            up_right_diagonal = chr(ord(position[0]) + spaces) + str(int(position[1:]) + spaces)
-            down_right_diagonal = chr(ord(position[0]) + spaces) + str(int(position[1:]) - spaces)
-        else:
-            up_left_diagonal = chr(ord(position[0]) - spaces) + str(int(position[1:]) - spaces)
-            down_left_diagonal = chr(ord(position[0]) - spaces) + str(int(position[1:]) + spaces)
-            up_right_diagonal = chr(ord(position[0]) + spaces) + str(int(position[1:]) - spaces)
-            down_right_diagonal = chr(ord(position[0]) + spaces) + str(int(position[1:]) + spaces)
+        return self._type
 
-        diagonals = [up_left_diagonal, down_left_diagonal, up_right_diagonal, down_right_diagonal]
-        return diagonals
+    def get_code(self):
+        """
+        Returns the code the Board stores for this piece on its flat array of tiles - the piece type, plus RED if the
+        piece belongs to the red player
+        """
+        return self._code
 
 
 class Soldier(Piece):
     """
-    A child class that breaks out specific movement logic for Soldier pieces. Using the orthogonal spaces generated
-    by the parent Piece class, the Soldier class then determines which of those movements the Soldier is allowed to
-    take - again, given no board restraints and with no knowledge of other pieces.
+    A child class that breaks out specific movement logic for Soldier pieces - which tiles the Soldier is allowed to
+    move to, given no board restraints and with no knowledge of other pieces.
 
-    It also defines diagonal movement for the Solider piece, which is used only in specific scenarios. The Game object
-    determines when different types of movement should be used by a Soldier piece, based on the Board state, and asks
-    for the appropriate type.
+    A soldier moves one tile sideways or forwards, and, inside the enemy palace, one tile diagonally forwards along
+    the palace lines. Both kinds of move are in the SOLDIER_MOVES table, so the Game object doesn't have to ask for
+    the diagonal moves separately.
     """
-    def __init__(self, position, player):
-        """
-        Inherits from the Piece init method (uses super()), but also defines its own "diagonals" attribute for use
-        when determining palace movement. The init method also calls the "set_basic_moves" method for the solider,
-        so that the starting basic moves for the soldier align with its piece logic.
-        :param position: the tile that the piece starts on - should be a key in the board dictionary
-        :param player: the Player object that the piece should be associated to
-        """
-        super().__init__(position, player)
-        self._diagonals = []
-        self.set_basic_moves()
-        self.set_diagonals(position)
+    __slots__ = ()
+    _type = SOLDIER
 
     def __str__(self):
         """
@@ -1024,34 +2052,14 @@ class Soldier(Piece):
         """
         return 'soldier'
 
-    def get_diagonals_in_palace(self):
+    def get_basic_moves(self, position):
         """
-        Returns the list of diagonal moves (the "diagonal" attribute) for use in determining what possible moves
-        a soldier has when it's in the palace
+        Returns the tiles the soldier could step to from the given tile, looked up in the SOLDIER_MOVES table for its
+        color (which way is "forwards" depends on the color).
+        :param position: the tile the soldier is on
+        :return: a tuple of tiles
         """
-        return self._diagonals
-
-    def set_basic_moves(self):
-        """
-        Method to determine the possible orthogonal moves for this piece type - this does not account for other pieces
-        on the board or even the board limits. It is only meant as a starting place of "possible moves" that the
-        Game class will further define at move time.
-        :return: None
-        """
-        if self._player.get_color() == 'blue':
-            self._basic_moves = [self._left_move, self._right_move, self._down_move]
-        else:
-            self._basic_moves = [self._left_move, self._right_move, self._up_move]
-
-    def set_diagonals(self, position):
-        """
-        Method to set possible diagonal moves for this piece type - uses the "diagonals" method of the Piece class
-        for its foundation and removes the "down" diagonal (what "down" is depends on piece color).
-        :return: None
-        """
-        if self._player.get_color() == 'blue':
-            diagonals = self.diagonals(position, 1)
-            self._diagonals = diagonals[0:-1:2]
+        return SOLDIER_MOVES[self._player.get_color()][position]
 
 
 class Rolling(Piece):
@@ -1067,108 +2075,20 @@ class Rolling(Piece):
     The Rolling class is never called/used directly - its only function is to hold logic used by both the Cannon and
     Chariot classes.
     """
-    def __init__(self, position, player):
-        """
-        Inherits from the Piece init method (uses super()), but also defines its own "diagonals" attribute for use
-        when determining palace movement. The init method also calls the "set_basic_moves" method for the rolling
-        piece types, so that the starting basic moves for the cannon and chariot align with their piece logic.
-        :param position: the tile that the piece starts on - should be a key in the board dictionary
-        :param player: the Player object that the piece should be associated to
-        """
-        super().__init__(position, player)
-        self.set_basic_moves(position)
-        self._diagonals = []
+    __slots__ = ()
 
-    def get_diagonals(self):
-        """
-        Returns the current possible diagonal moves for use in determining where the cannon or chariot can move
-        when inside the palace.
+    def get_basic_moves(self, position):
         """
-        return self._diagonals
+        Returns the possible moves for these piece types - this does not account for other pieces on the board, but
+        does take into account board limits. It is only meant as a starting place of "possible moves" that the Game
+        class will further define at move time.
 
-    def set_basic_moves(self, position):
+        The moves are the rays precomputed for the position in the module's ROLLING_RAYS table, each ordered outwards
+        from the position - e.g. the left moves from "e4" are ('d4', 'c4', 'b4', 'a4').
+        :param position: the tile the piece is on
+        :return: a tuple of rays
         """
-        Method to determine the possible orthogonal moves for these piece types - this does not account for other pieces
-        on the board, but does take into account board limits. It is only meant as a starting place of "possible moves"
-        that the Game class will further define at move time.
-
-        Calls, in turn, each of the methods below to set each of the directions with the list of board spaces the
-        methods return. This means that the "basic_moves" for this class end up in the format:
-        [[up_moves],[left_moves],[right_moves],[down_moves]].
-        :return: None
-        """
-        up_moves = self.moving_up_or_down(position, -1)
-        down_moves = self.moving_up_or_down(position, 1)
-        left_moves = self.moving_left_or_right(position, -1)
-        right_moves = self.moving_left_or_right(position, 1)
-
-        basic_moves = [up_moves, down_moves, left_moves, right_moves]
-
-        self._basic_moves = basic_moves
-
-    def moving_up_or_down(self, position, delta, up_or_down_moves=None):
-        """
-        Recursive method that calls itself to keep determining the next position on the board until the board
-        limits are reached. This is the only piece class that actually takes board limits into account, since some
-        base case was necessary for the recursion.
-
-        The recursion subtracts or adds (based on the delta passed, which will be +1 or -1) from the position passed
-        on each call. This means that the method ends up returning a list of positions in up or down in a column - e.g.:
-        ['a4', 'a3', 'a2', 'a1']
-        :param position: the starting position of the piece
-        :param delta: the change to make on each call - either add 1 (1) or subtract 1 (-1) from the current position
-        :param up_or_down_moves: the list of moves that gets added to each pass; default is none to avoid mutation
-        :return: the final list of "up_or_down_moves" once the board limits are reached in the intended direction
-        """
-        if up_or_down_moves is None:
-            up_or_down_moves = []
-        if 10 < int(position[1:]) or int(position[1:]) < 1:
-            return up_or_down_moves[:-1]
-        one_up_or_down = position[0] + str(int(position[1:]) + delta)
-        up_or_down_moves.append(one_up_or_down)
-        return self.moving_up_or_down(one_up_or_down, delta, up_or_down_moves)
-
-    def moving_left_or_right(self, position, delta, left_or_right_moves=None):
-        """
-        Same as above method except for left or right - so, instead of subtracting from / adding to the column on each
-        pass, it subtracts from / adds to the row and returns a list of row positions. E.g.: ['f4', 'g4', 'h4', 'i4']
-        :param position: the starting position of the piece
-        :param delta: the change to make on each call - either add 1 (1) or subtract 1 (-1) from the current position
-        :param left_or_right_moves:
-        :return: the final list of "up_or_down_moves" once the board limits are reached in the intended direction
-        """
-        if left_or_right_moves is None:
-            left_or_right_moves = []
-        if 'i' < position[0] or position[0] < 'a':
-            return left_or_right_moves[:-1]
-        one_left_or_right = chr(ord(position[0]) + delta) + position[1:]
-        left_or_right_moves.append(one_left_or_right)
-        return self.moving_left_or_right(one_left_or_right, delta, left_or_right_moves)
-
-    def set_palace_diagonals(self, position):
-        """
-        Calls the Piece class' diagonal method twice - once to get the adjacent diagonal to the current position
-        and once to get the diagonal adjacent to the first diagonal. Both diagonals are necessary for different
-        reasons and will both be needed by the Game class to determine whether a piece can move in the palace (more
-        detailed explain in the Game class methods for movement)
-
-        Sets the class' "diagonals" value to the end result of this method.
-        :param position: the starting position of the piece
-        :return: None
-        """
-        up_left_diagonals = []
-        up_right_diagonals = []
-        down_left_diagonals = []
-        down_right_diagonals = []
-
-        for index in range(1, 3):
-            diagonals = self.diagonals(position, index)
-            up_left_diagonals.append(diagonals[0])
-            up_right_diagonals.append(diagonals[2])
-            down_left_diagonals.append(diagonals[1])
-            down_right_diagonals.append(diagonals[3])
-
-        self._diagonals = up_left_diagonals + up_right_diagonals + down_left_diagonals + down_right_diagonals
+        return ROLLING_RAYS[position]
 
 
 class Chariot(Rolling):
@@ -1177,6 +2097,9 @@ class Chariot(Rolling):
     Game object knows how to handle its specific interactions with other pieces on the board. It is created by the
     Board class at the start of a game instance.
     """
+    __slots__ = ()
+    _type = CHARIOT
+
     def __init__(self, position, player):
         """
         Same as Rolling initialization - simply inherits from it using super() (i.e., no special logic)
@@ -1200,6 +2123,9 @@ class Cannon(Rolling):
     Game object knows how to handle its specific interactions with other pieces on the board. It is created by the
     Board class at the start of a game instance.
     """
+    __slots__ = ()
+    _type = CANNON
+
     def __init__(self, position, player):
         """
         Same as Rolling initialization - simply inherits from it using super() (i.e., no special logic)
@@ -1222,12 +2148,15 @@ class Mammal(Piece):
     The Mammal child class is used to contain movement logic common to both Elephant and Horse pieces, which are
     children of the Mammal class.
 
-    Elephants and Horses are governed by the same movement logic, with slight differences, so the Mammal class
-    creates the foundation off of which both pieces' possible moves are generated.
+    Elephants and Horses are governed by the same movement logic, with slight differences: both step orthogonally
+    onto a "leg" tile first, and can be blocked there, before moving diagonally. Their move tables (HORSE_MOVES and
+    ELEPHANT_MOVES) are laid out the same way, as (leg, ...) pairs, so that the Game object can check both for
+    blockers with its "make_mammal_move" method.
 
     The Mammal class is never called/used directly - its only function is to hold logic used by both the Elephant
     and Horse classes.
     """
+    __slots__ = ()
 
     def __init__(self, position, player):
         """
@@ -1237,69 +2166,14 @@ class Mammal(Piece):
         """
         super().__init__(position, player)
 
-    def set_basic_moves(self, spaces):
-        """
-        Method to set the basic moves for each mammal class. Uses the base orthogonal moves from the Piece class
-        to first determine the orthogonal moves from the starting position. Then it calls the "mammal_diagonals"
-        method below to determine the diagonal moves from each of those orthogonal moves. The spaces parameter
-        passed to the mammal_diagonals method to determine how far diagonally to move - e.g., passing 2 would
-        find a position two spaces diagonally from the starting position.
-
-        Ends up setting the basic moves in the form [[orthogonal move[diagonal, diagonal], [orthogonal...etc.]]
-        :param spaces: the number of spaces the piece can move diagonally (after moving orthogonally)
-        :return: None
-        """
-        self._basic_moves = self.mammal_diagonals(spaces)
-
-    def mammal_diagonals(self, spaces):
-        """
-        Uses the Piece class' base diagonal method to determine the two diagonal moves from each orthogonal
-        position. For example, if the piece starts at 'b4', then this method would determine that the two
-        diagonal positions to the right would be 'd3' and 'd5' (the piece moves right to 'c4' and then can
-        move up to the right or down to the right).
-
-        Uses the spaces parameter to determine the number of diagonal spaces to move. To use the same example,
-        passing "1" would return 'd3' and 'd5', but passing "2" would return 'e2' and 'e6'. This allows this
-        method to be used for both the horse and the elephant (since they move in the same manner, with the
-        only difference being the number of diagonals).
-        :param spaces: the number of spaces the piece can move diagonally (after moving orthogonally)
-        :return: Returns the a list of lists (two diagonal spaces comprise a list, with four lists, one for
-        each direction)
-        """
-        left_diagonals = self.diagonals(self._left_move, spaces)
-        left_move = [left_diagonals[0], left_diagonals[1]]
-        right_diagonals = self.diagonals(self._right_move, spaces)
-        right_move = [right_diagonals[2], right_diagonals[3]]
-        if self._player.get_color() == 'blue':
-            up_once = self._down_move
-            down_once = self._up_move
-            up_diagonals = self.diagonals(self._down_move, spaces)
-            down_diagonals = self.diagonals(self._up_move, spaces)
-        else:
-            up_once = self._up_move
-            down_once = self._down_move
-            up_diagonals = self.diagonals(self._up_move, spaces)
-            down_diagonals = self.diagonals(self._down_move, spaces)
-        up_move = [up_diagonals[1], up_diagonals[3]]
-        down_move = [down_diagonals[0], down_diagonals[2]]
-        return [[self._left_move, left_move], [self._right_move, right_move], [up_once, up_move],
-                [down_once, down_move]]
-
 
 class Horse(Mammal):
     """
     A child of the Mammal class. Uses the base logic in the Mammal class to generate its possible moves. It is
     created by the Board class at the start of a game instance.
     """
-    def __init__(self, position, player):
-        """
-        Same as Mammal initialization - except that it also sets the starting Horse moves by passing "1"
-        as the number of diagonal spaces to move to the Mammal class' "set_basic_moves" method
-        :param position: the tile that the piece starts on - should be a key in the board dictionary
-        :param player: the Player object that the piece should be associated to
-        """
-        super().__init__(position, player)
-        self.set_basic_moves(1)
+    __slots__ = ()
+    _type = HORSE
 
     def __str__(self):
         """
@@ -1309,21 +2183,24 @@ class Horse(Mammal):
         """
         return 'horse'
 
+    def get_basic_moves(self, position):
+        """
+        Returns the horse's moves from the given tile, from the HORSE_MOVES table, in the form
+        ((orthogonal, (diagonal, diagonal)), (orthogonal, ...), ...). For example, from 'b4' the direction to the
+        right is ('c4', ('d3', 'd5')) - the horse moves right to 'c4' and then diagonally on to 'd3' or 'd5'.
+        :param position: the tile the horse is on
+        :return: a tuple of directions
+        """
+        return HORSE_MOVES[position]
+
 
 class Elephant(Mammal):
     """
     A child of the Mammal class. Uses the base logic in the Mammal class to generate its possible moves. It is
     created by the Board class at the start of a game instance.
     """
-    def __init__(self, position, player):
-        """
-        Same as Mammal initialization - except that it also sets the starting Elephant moves by calling its own
-        special method.
-        :param position: the tile that the piece starts on - should be a key in the board dictionary
-        :param player: the Player object that the piece should be associated to
-        """
-        super().__init__(position, player)
-        self.set_elephant_moves()
+    __slots__ = ()
+    _type = ELEPHANT
 
     def __str__(self):
         """
@@ -1333,35 +2210,16 @@ class Elephant(Mammal):
         """
         return 'elephant'
 
-    def set_elephant_moves(self):
+    def get_basic_moves(self, position):
         """
-        This method essentially calls the "set_basic_moves" method of the Mammal class twice - once passing "1"
-        as the number of diagonal spaces and once passing "2" as the number.
-
-        This is to allow a slight modification of the final form of the basic moves list. Instead of [[orthogonal,
-        [diagonal, diagonal], [orthogonal, [diagonal, diagonal]], etc....], it returns a list in the form:
-
-        [[orthogonal, [[diagonal 1, diagonal 2], [diagonal 1, diagonal 2]], orthogonal....etc.]. This allows
-        the Game class to easily check for blockers at each step of the Elephant's path.
-        :return: None (sets the value directly, doesn't return)
+        Returns the elephant's moves from the given tile, from the ELEPHANT_MOVES table. These are laid out like the
+        horse's, except that each diagonal is a (diagonal 1, diagonal 2) path: ((orthogonal, ((diagonal 1,
+        diagonal 2), (diagonal 1, diagonal 2))), (orthogonal, ...), ...). This allows the Game class to easily check
+        for blockers at each step of the Elephant's path.
+        :param position: the tile the elephant is on
+        :return: a tuple of directions
         """
-        first = self.mammal_diagonals(1)
-        second = self.mammal_diagonals(2)
-
-        basic_moves = []
-
-        for item in first:
-            basic_moves.append([item[0]])
-
-        for index in range(len(first)):
-            basic_moves[index].append([first[index][1][0]])
-            basic_moves[index].append([first[index][1][1]])
-
-        for index in range(len(second)):
-            basic_moves[index][1].append(second[index][1][0])
-            basic_moves[index][2].append(second[index][1][1])
-
-        self._basic_moves = basic_moves
+        return ELEPHANT_MOVES[position]
 
 
 class Palace(Piece):
@@ -1376,31 +2234,17 @@ class Palace(Piece):
     The Palace class is never called/used directly - its only function is to hold logic used by both the General
     and Guard classes.
     """
-    def __init__(self, position, player):
-        """
-        Inherits from the Piece init method (uses super()), but calls its own "set_basic_moves" method,
-        so that the starting basic moves for the General and Guard align with their piece logic.
-        :param position: the tile that the piece starts on - should be a key in the board dictionary
-        :param player: the Player object that the piece should be associated to
-        """
-        super().__init__(position, player)
-        self.set_basic_moves(position)
+    __slots__ = ()
 
-    def set_basic_moves(self, position):
+    def get_basic_moves(self, position):
         """
-        Uses the basic orthogonal and diagonal moves defined in the Piece class to set the list of possible
-        moves for the General and Guard classes. Again, these are only meant as a starting place and will be
-        further refined by the Game class during move time.
-        :return: None
+        Returns the tiles the General or Guard could step to from the given tile, looked up in the PALACE_MOVES table
+        for its color - one step along the lines of its own palace. Again, these are only meant as a starting place
+        and will be further refined by the Game class during move time.
+        :param position: the tile the piece is on
+        :return: a tuple of tiles
         """
-        diagonal_points = ['d10', 'd8', 'e9', 'f8', 'f10', 'd1', 'd3', 'e2', 'f1', 'f3']
-        if self._player.get_color() == 'blue':
-            self._basic_moves = [self._left_move, self._right_move, self._down_move, self._up_move]
-        else:
-            self._basic_moves = [self._left_move, self._right_move, self._up_move, self._down_move]
-        if position in diagonal_points:
-            diagonals = self.diagonals(position, 1)
-            self._basic_moves += diagonals
+        return PALACE_MOVES[self._player.get_color()][position]
 
 
 class General(Palace):
@@ -1408,6 +2252,9 @@ class General(Palace):
     A child of the Palace class. Contains no unique logic, but is used by the Game class to determine whether
     a player is in check or checkmate. It is created by the Board class at the start of a game instance.
     """
+    __slots__ = ()
+    _type = GENERAL
+
     def __init__(self, position, player):
         """
         Same as Palace initialization - simply inherits from it using super() (i.e., no special logic)
@@ -1431,6 +2278,9 @@ class Guard(Palace):
     the Game object knows which piece to use when determining check or checkmate. It is created by the Board class
     at the start of a game instance.
     """
+    __slots__ = ()
+    _type = GUARD
+
     def __init__(self, position, player):
         """
         Same as Palace initialization - simply inherits from it using super() (i.e., no special logic)
@@ -1446,3 +2296,1665 @@ class Guard(Palace):
         :return: Returns the string 'guard'
         """
         return 'guard'
+
+
+class OpeningBook:
+    """
+    An opening book - a table of the moves played from positions early in recorded games, with how often each was
+    played and how often it won, kept in a file built by build_opening_book. The file starts with BOOK_MAGIC,
+    followed by entries of BOOK_ENTRY.size bytes each: the position's 64-bit key (see Board.hash_key), the indexes
+    in SQUARES of the move's start and end tiles, the number of games it was played in, and the number of those won
+    by the player who made it. The entries are sorted, so a position is found with a binary search.
+
+    The file is memory-mapped rather than read, so opening a book is instant whatever its size, and every process
+    that opens the same book shares the one copy of it in memory.
+    """
+    def __init__(self, path):
+        """
+        Opens and memory-maps a book file
+        :param path: the path of a file made by build_opening_book
+        :raises ValueError: if the file isn't an opening book
+        """
+        self._path = path
+        with open(path, 'rb') as book_file:
+            self._map = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(BOOK_MAGIC)] != BOOK_MAGIC or (len(self._map) - len(BOOK_MAGIC)) % BOOK_ENTRY.size:
+            self._map.close()
+            raise ValueError('not an opening book')
+        self._size = (len(self._map) - len(BOOK_MAGIC)) // BOOK_ENTRY.size
+
+    def __deepcopy__(self, memo):
+        """
+        The book never changes, so a copied game can share the same book rather than copying it
+        :return: the same OpeningBook object
+        """
+        return self
+
+    def __reduce__(self):
+        """
+        A pickled book (e.g. one sent to another process) is opened again from its path, and so maps the same file
+        :return: the class and the path to create it from
+        """
+        return OpeningBook, (self._path,)
+
+    def get_size(self):
+        """
+        Returns the number of entries in the book
+        """
+        return self._size
+
+    def lookup(self, key):
+        """
+        Finds the book's moves for a position
+        :param key: the position's 64-bit key, as returned by Board.hash_key
+        :return: a list of ((start_position, end_position), games, wins) tuples, most played first - empty if the
+        book doesn't have the position
+        """
+        # binary search for the first entry with the key
+        low, high = 0, self._size
+        while low < high:
+            middle = (low + high) // 2
+            if self.read_key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        moves = []
+        while low < self._size and self.read_key(low) == key:
+            _, start, end, games, wins = BOOK_ENTRY.unpack_from(self._map, len(BOOK_MAGIC) + low * BOOK_ENTRY.size)
+            moves.append(((SQUARES[start], SQUARES[end]), games, wins))
+            low += 1
+        moves.sort(key=lambda move: move[1], reverse=True)
+        return moves
+
+    def read_key(self, index):
+        """
+        Reads the position key of one of the book's entries
+        :param index: the number of the entry
+        :return: the entry's 64-bit position key
+        """
+        offset = len(BOOK_MAGIC) + index * BOOK_ENTRY.size
+        return int.from_bytes(self._map[offset:offset + 8], 'big')
+
+    def close(self):
+        """
+        Closes the book's memory map. The book can't be used afterwards.
+        :return: None
+        """
+        self._map.close()
+
+
+class MoveCache:
+    """
+    A bounded cache of the moves found for positions, shared by any games set to use it (see
+    JanggiGame.set_move_cache). Each entry holds a position's pseudo-legal moves and legal moves for one player, as
+    they are asked for. Entries are keyed by the Board's 64-bit position key and the player, and also keep the
+    position itself, so that two positions sharing a key can never be confused. Since a position's moves never
+    change, nothing needs to be removed when moves are made - the board simply has a different key afterwards. When
+    the cache is full, the least recently used entry is dropped.
+    """
+    PSEUDO_LEGAL = 1
+    LEGAL = 2
+
+    def __init__(self, size=4096):
+        """
+        Initializes an empty cache, and the counters used to report how useful the cache is
+        :param size: the most positions to keep
+        """
+        self._size = size
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def probe(self, board, color, kind):
+        """
+        Looks up the moves for a board's current position
+        :param board: the Board object
+        :param color: the color of the player to move
+        :param kind: PSEUDO_LEGAL or LEGAL
+        :return: a tuple of (start_position, end_position) moves, or None if the cache doesn't have them
+        """
+        key = (board.hash_key(), color)
+        entry = self._entries.get(key)
+        if entry is not None and entry[kind] is not None and entry[0] == board.get_position_bytes():
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[kind]
+        self._misses += 1
+        return None
+
+    def store(self, board, color, kind, moves):
+        """
+        Stores the moves for a board's current position, dropping the least recently used entry if the cache is full
+        :param board: the Board object
+        :param color: the color of the player to move
+        :param kind: PSEUDO_LEGAL or LEGAL
+        :param moves: the (start_position, end_position) moves
+        :return: None
+        """
+        key = (board.hash_key(), color)
+        position = board.get_position_bytes()
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != position:
+            entry = [position, None, None]
+            self._entries[key] = entry
+            if len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        else:
+            self._entries.move_to_end(key)
+        entry[kind] = tuple(moves)
+
+    def clear(self):
+        """
+        Empties the cache and resets its counters
+        :return: None
+        """
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_size(self):
+        """
+        Returns the most positions the cache keeps
+        """
+        return self._size
+
+    def get_length(self):
+        """
+        Returns the number of positions in the cache
+        """
+        return len(self._entries)
+
+    def get_hit_rate(self):
+        """
+        Returns the fraction of lookups that found their moves in the cache
+        """
+        if self._hits + self._misses == 0:
+            return 0.0
+        return self._hits / (self._hits + self._misses)
+
+    def get_counters(self):
+        """
+        Returns a dictionary of the cache's counters - lookups that found their moves ("hits"), lookups that didn't
+        ("misses"), and entries dropped to make room ("evictions")
+        """
+        return {'hits': self._hits, 'misses': self._misses, 'evictions': self._evictions}
+
+
+class GamePool:
+    """
+    A pool of JanggiGame objects, so that starting a game doesn't have to mean creating one. A finished game is given
+    back to the pool with release, which resets it to the starting position (see JanggiGame.reset); acquire then hands
+    it out again, and only creates a new game when the pool is empty. At most "size" games are kept in the pool - any
+    more given back are left for the garbage collector. The pool counts the games it has created and the games it has
+    handed out again, to show how well it's working.
+    """
+    def __init__(self, size=1024):
+        """
+        Initializes an empty pool
+        :param size: the most games to keep in the pool
+        """
+        self._size = size
+        self._games = []
+        self._created = 0
+        self._reused = 0
+
+    def acquire(self):
+        """
+        Hands out a game in the starting position
+        :return: a JanggiGame object - from the pool if there is one, otherwise a new one
+        """
+        if self._games:
+            self._reused += 1
+            return self._games.pop()
+        self._created += 1
+        return JanggiGame()
+
+    def release(self, game):
+        """
+        Takes a game back, resetting it so that it can be handed out again. The game mustn't be used again after
+        being given back.
+        :param game: the JanggiGame object - normally one handed out by acquire
+        :return: None
+        """
+        if len(self._games) < self._size:
+            game.reset()
+            self._games.append(game)
+
+    def get_size(self):
+        """
+        Returns the most games the pool keeps
+        """
+        return self._size
+
+    def get_length(self):
+        """
+        Returns the number of games waiting in the pool
+        """
+        return len(self._games)
+
+    def get_counters(self):
+        """
+        Returns a dictionary of the pool's counters - games created because the pool was empty ("created"), and games
+        handed out again from the pool ("reused")
+        """
+        return {'created': self._created, 'reused': self._reused}
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside a Search when its time limit runs out, to unwind the search back to the root
+    """
+    pass
+
+
+class TranspositionTable:
+    """
+    A fixed-size table of search results, keyed by the Board's 64-bit position key. Each position maps to one slot
+    (its key modulo the table size), so the table never grows; when two positions want the same slot, the
+    replacement policy decides which one to keep:
+        - a result for the same position always replaces the old one
+        - a result from an earlier search (an older "generation") is always replaced
+        - otherwise the result searched to the greater depth is kept
+
+    Each entry is a tuple of (key, generation, depth, score, bound, move), where bound is one of EXACT, LOWER or
+    UPPER, saying whether the score is exact or only a lower or upper bound on the true score.
+    """
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+    def __init__(self, size=1 << 16):
+        """
+        Initializes an empty table with the given number of slots, and the counters used to report how useful the
+        table is.
+        :param size: the number of slots in the table
+        """
+        self._size = size
+        self._slots = [None] * size
+        self._generation = 0
+        self._probes = 0
+        self._hits = 0
+        self._stores = 0
+
+    def new_search(self):
+        """
+        Starts a new generation - results stored from now on take priority over results from earlier searches
+        :return: None
+        """
+        self._generation += 1
+
+    def probe(self, key):
+        """
+        Looks up the stored result for a position
+        :param key: the position key, from Board.hash_key
+        :return: the (depth, score, bound, move) of the stored result, or None if the position isn't in the table
+        """
+        self._probes += 1
+        entry = self._slots[key % self._size]
+        if entry is not None and entry[0] == key:
+            self._hits += 1
+            return entry[2:]
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        """
+        Stores the result of searching a position, if the replacement policy allows it
+        :param key: the position key, from Board.hash_key
+        :param depth: the depth the position was searched to
+        :param score: the score found
+        :param bound: EXACT, LOWER or UPPER
+        :param move: the best move found, or None
+        :return: None
+        """
+        index = key % self._size
+        entry = self._slots[index]
+        if entry is None or entry[0] == key or entry[1] != self._generation or depth >= entry[2]:
+            self._slots[index] = (key, self._generation, depth, score, bound, move)
+            self._stores += 1
+
+    def clear(self):
+        """
+        Empties the table and resets its counters
+        :return: None
+        """
+        self._slots = [None] * self._size
+        self._probes = 0
+        self._hits = 0
+        self._stores = 0
+
+    def get_size(self):
+        """
+        Returns the number of slots in the table
+        """
+        return self._size
+
+    def get_hit_rate(self):
+        """
+        Returns the fraction of lookups that found their position in the table
+        """
+        if self._probes == 0:
+            return 0.0
+        return self._hits / self._probes
+
+    def get_counters(self):
+        """
+        Returns a dictionary of the table's counters - lookups ("probes"), lookups that found their position
+        ("hits"), and results stored ("stores")
+        """
+        return {'probes': self._probes, 'hits': self._hits, 'stores': self._stores}
+
+
+class Search:
+    """
+    The Search class finds good moves for a JanggiGame, by looking ahead with a negamax alpha-beta search. It searches
+    with iterative deepening - one move ahead, then two, and so on - so that it always has a move ready when its time
+    runs out, and so that each iteration can start with the best moves found by the last.
+
+    Moves are generated by the Game object's "make_x_move" methods and made and taken back in place with the Board's
+    push and pop methods. A move is legal if it doesn't leave the mover's general attacked, the same rule make_move
+    uses; a player who is in check and has no legal moves is checkmated. Passing is searched as a move whenever the
+    player isn't in check. The search keeps the Board's position key up to date as it goes, and saves what it finds in
+    a TranspositionTable keyed on it.
+
+    Moves are searched in order: the best move found for the position before, then captures (most valuable victim
+    first), then "killer" moves that caused a cutoff at the same depth elsewhere in the search, then the remaining
+    moves by their history score. At the end of the search, captures keep being searched ("quiescence") so that a
+    position isn't scored in the middle of an exchange.
+
+    Positions are scored by material, from the point of view of the player to move (see PIECE_VALUES).
+    """
+    MAX_QUIESCENCE_DEPTH = 8
+
+    def __init__(self, game, table_size=1 << 16):
+        """
+        Initializes a Search for the given game
+        :param game: the JanggiGame object to search moves for
+        :param table_size: the number of slots in the transposition table
+        """
+        self._game = game
+        self._table = TranspositionTable(table_size)
+        self._killers = []
+        self._history = {}
+        self._nodes = 0
+        self._deadline = None
+
+    def get_table(self):
+        """
+        Returns the Search's TranspositionTable
+        """
+        return self._table
+
+    def get_nodes(self):
+        """
+        Returns the number of positions visited by the last search
+        """
+        return self._nodes
+
+    def find_best_move(self, depth=None, time_limit_ms=None):
+        """
+        Searches the game's current position for the best move of the player whose turn it is. The board is left
+        exactly as it was.
+        :param depth: the number of moves ahead to search. If a time limit is given instead, the search goes as deep
+        as it can in that time; if neither is given, DEFAULT_SEARCH_DEPTH is used.
+        :param time_limit_ms: the most time, in milliseconds, the search should take. Searching one move ahead always
+        finishes, so there is always a move to return.
+        :return: the best (start_position, end_position) move found, or None if there are no legal moves
+        """
+        if depth is None:
+            depth = DEFAULT_SEARCH_DEPTH if time_limit_ms is None else 64
+        if time_limit_ms is None:
+            self._deadline = None
+        else:
+            self._deadline = time.perf_counter() + time_limit_ms / 1000
+
+        color = self._game.get_turn_color()
+        self._table.new_search()
+        self._killers = [[None, None] for _ in range(depth + 1)]
+        self._history = {}
+        self._nodes = 0
+
+        best_move = None
+        for iteration in range(1, depth + 1):
+            try:
+                move, score = self.search_root(color, iteration, best_move)
+            except SearchTimeout:
+                break
+            if move is None:
+                break
+            best_move = move
+            # there's no point looking any further once a forced mate has been found
+            if abs(score) >= MATE_SCORE - 1000:
+                break
+
+        if best_move is None:
+            return None
+        if best_move == 'pass':
+            general_position = self._game.get_board().get_general_position(color)
+            return general_position, general_position
+        return best_move
+
+    def score_position(self, depth):
+        """
+        Scores the game's current position by searching it to a fixed depth, from the point of view of the player
+        whose turn it is. The board is left exactly as it was.
+        :param depth: the number of moves ahead to search
+        :return: the score of the position
+        """
+        self._deadline = None
+        self._table.new_search()
+        self._killers = [[None, None] for _ in range(depth + 1)]
+        self._history = {}
+        self._nodes = 0
+        return self.negamax(self._game.get_turn_color(), depth, -INFINITE_SCORE, INFINITE_SCORE, 0)
+
+    def search_root(self, color, depth, previous_best):
+        """
+        Searches every move of the position at the root of the search, to the given depth
+        :param color: the color of the player to move
+        :param depth: the number of moves ahead to search
+        :param previous_best: the best move from the last iteration, which is searched first
+        :return: a tuple of the best move found ("pass" for passing) and its score
+        """
+        board = self._game.get_board()
+        enemy = OPPONENT[color]
+        in_check = self.in_check(color)
+        moves = self.order_moves(self.generate_moves(color), previous_best, 0)
+        if not in_check:
+            moves.append('pass')
+        if previous_best == 'pass' and not in_check:
+            moves.remove('pass')
+            moves.insert(0, 'pass')
+
+        alpha = -INFINITE_SCORE
+        best_move = None
+        for move in moves:
+            if not self.make_move(move, color):
+                continue
+            try:
+                score = -self.negamax(enemy, depth - 1, -INFINITE_SCORE, -alpha, 1)
+            finally:
+                self.unmake_move(move)
+            if score > alpha or best_move is None:
+                alpha = score
+                best_move = move
+            # only the first iteration is allowed to finish past the time limit
+            if depth > 1:
+                self.check_time()
+        if best_move is not None:
+            self._table.store(board.hash_key(), depth, alpha, TranspositionTable.EXACT, best_move)
+        return best_move, alpha
+
+    def negamax(self, color, depth, alpha, beta, ply):
+        """
+        Scores a position by searching its moves to the given depth, from the point of view of the player to move
+        :param color: the color of the player to move
+        :param depth: the number of moves left to search - at 0, only captures are searched, by quiescence
+        :param alpha: the score the player to move is already sure of
+        :param beta: the score the other player is already sure of - if the player to move can do at least this
+        well, the other player won't allow this position, and the search can stop
+        :param ply: the number of moves made since the root of the search
+        :return: the score of the position
+        """
+        self._nodes += 1
+        if self._nodes & 1023 == 0:
+            self.check_time()
+
+        board = self._game.get_board()
+        key = board.hash_key()
+        original_alpha = alpha
+        table_move = None
+        entry = self._table.probe(key)
+        if entry is not None:
+            entry_depth, entry_score, bound, table_move = entry
+            if entry_depth >= depth:
+                entry_score = self.score_from_table(entry_score, ply)
+                if bound == TranspositionTable.EXACT:
+                    return entry_score
+                if bound == TranspositionTable.LOWER and entry_score >= beta:
+                    return entry_score
+                if bound == TranspositionTable.UPPER and entry_score <= alpha:
+                    return entry_score
+
+        in_check = self.in_check(color)
+        if depth <= 0:
+            # a player in check gets one more move to get out of it before the position is scored
+            if not in_check:
+                return self.quiescence(color, alpha, beta, ply, 0)
+            depth = 1
+
+        enemy = OPPONENT[color]
+        tiles = board.get_tiles()
+        moves = self.order_moves(self.generate_moves(color), table_move, ply)
+        if not in_check:
+            moves.append('pass')
+
+        best_score = -INFINITE_SCORE
+        best_move = None
+        for move in moves:
+            if not self.make_move(move, color):
+                continue
+            try:
+                score = -self.negamax(enemy, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                self.unmake_move(move)
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                # remember quiet moves that cause a cutoff, so they're tried early elsewhere
+                if move != 'pass' and tiles[move[1]] is None:
+                    self.record_cutoff(move, depth, ply)
+                break
+
+        if best_move is None:
+            # no legal moves while in check is checkmate
+            return -MATE_SCORE + ply
+
+        if best_score <= original_alpha:
+            bound = TranspositionTable.UPPER
+        elif best_score >= beta:
+            bound = TranspositionTable.LOWER
+        else:
+            bound = TranspositionTable.EXACT
+        self._table.store(key, depth, self.score_to_table(best_score, ply), bound, best_move)
+        return best_score
+
+    def quiescence(self, color, alpha, beta, ply, depth):
+        """
+        Scores a position at the end of the search by searching only captures, until the position is quiet. The
+        player to move can always choose not to capture, so the position's own score is a lower bound. Captures that
+        static exchange evaluation (see JanggiGame.see) says lose material are not searched.
+        :param color: the color of the player to move
+        :param alpha: the score the player to move is already sure of
+        :param beta: the score the other player is already sure of
+        :param ply: the number of moves made since the root of the search
+        :param depth: the number of captures searched so far
+        :return: the score of the position
+        """
+        self._nodes += 1
+        if self._nodes & 1023 == 0:
+            self.check_time()
+
+        score = self.evaluate(color)
+        if score >= beta or depth >= self.MAX_QUIESCENCE_DEPTH:
+            return score
+        if score > alpha:
+            alpha = score
+
+        enemy = OPPONENT[color]
+        game = self._game
+        squares = game.get_board().get_squares()
+        for move in self.order_moves(self.generate_moves(color, True), None, ply):
+            # captures that lose material once the exchange is played out can't raise the score - skip them. Taking
+            # a piece worth at least as much as the capturing piece can't lose material, so only the others need
+            # the exchange worked out.
+            if (PIECE_VALUES[squares[SQUARE_INDEX[move[0]]]] > PIECE_VALUES[squares[SQUARE_INDEX[move[1]]]] and
+                    game.see(move[0], move[1]) < 0):
+                continue
+            if not self.make_move(move, color):
+                continue
+            try:
+                score = -self.quiescence(enemy, -beta, -alpha, ply + 1, depth + 1)
+            finally:
+                self.unmake_move(move)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def generate_moves(self, color, captures_only=False):
+        """
+        Generates the possible moves of each of a player's pieces with the Game object's pseudo_legal_moves method.
+        The moves may still leave the player's general open to capture - make_move checks for that.
+        :param color: the color of the player to move
+        :param captures_only: if True, only moves that capture a piece are generated
+        :return: a list of (start_position, end_position) tuples
+        """
+        moves = self._game.pseudo_legal_moves(color)
+        if captures_only:
+            tiles = self._game.get_board().get_tiles()
+            return [move for move in moves if tiles[move[1]] is not None]
+        return moves
+
+    def order_moves(self, moves, first_move, ply):
+        """
+        Sorts moves into the order they should be searched in: the given first move, then captures (most valuable
+        victim first, least valuable attacker first among equal victims), then killer moves, then everything else
+        by history score
+        :param moves: a list of (start_position, end_position) tuples
+        :param first_move: the move to search first - usually the best move from the transposition table - or None
+        :param ply: the number of moves made since the root of the search, for looking up killer moves
+        :return: a new, sorted list of the moves
+        """
+        squares = self._game.get_board().get_squares()
+        killers = self._killers[ply] if ply < len(self._killers) else (None, None)
+        history = self._history
+        scored = []
+        for move in moves:
+            if move == first_move:
+                score = 1 << 40
+            else:
+                victim = squares[SQUARE_INDEX[move[1]]]
+                if victim != EMPTY:
+                    score = (1 << 32) + PIECE_VALUES[victim] * 16 - PIECE_VALUES[squares[SQUARE_INDEX[move[0]]]] // 100
+                elif move == killers[0] or move == killers[1]:
+                    score = 1 << 31
+                else:
+                    score = history.get(move, 0)
+            scored.append((score, move))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def record_cutoff(self, move, depth, ply):
+        """
+        Remembers a quiet move that caused a cutoff - as a killer move at this ply, and in its history score
+        :param move: the (start_position, end_position) move
+        :param depth: the depth left to search when the cutoff happened - deeper cutoffs count for more
+        :param ply: the number of moves made since the root of the search
+        :return: None
+        """
+        if ply < len(self._killers):
+            killers = self._killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        self._history[move] = self._history.get(move, 0) + depth * depth
+
+    def make_move(self, move, color):
+        """
+        Makes a move in place on the board and passes the turn in the position key, unless the move leaves the
+        player's general open to capture, in which case the board is left as it was
+        :param move: a (start_position, end_position) tuple, or "pass"
+        :param color: the color of the player making the move
+        :return: True if the move was made, False if it was illegal
+        """
+        board = self._game.get_board()
+        if move != 'pass':
+            board.push(move[0], move[1])
+            if self.in_check(color):
+                board.pop()
+                return False
+        board.switch_side_key()
+        return True
+
+    def unmake_move(self, move):
+        """
+        Takes back a move made by make_move
+        :param move: the (start_position, end_position) tuple, or "pass", that was made
+        :return: None
+        """
+        board = self._game.get_board()
+        board.switch_side_key()
+        if move != 'pass':
+            board.pop()
+
+    def in_check(self, color):
+        """
+        Returns True if the given player's general is attacked on the current board
+        :param color: the color of the player
+        """
+        board = self._game.get_board()
+        general_position = board.get_general_position(color)
+        return general_position is not None and self._game.is_square_attacked(general_position, OPPONENT[color], board)
+
+    def evaluate(self, color):
+        """
+        Scores the current position by material, from the point of view of the given player
+        :param color: the color of the player to move
+        :return: the player's material less the other player's
+        """
+        board = self._game.get_board()
+        squares = board.get_squares()
+        score = 0
+        for square in board.get_piece_positions(color):
+            score += PIECE_VALUES[squares[SQUARE_INDEX[square]]]
+        for square in board.get_piece_positions(OPPONENT[color]):
+            score -= PIECE_VALUES[squares[SQUARE_INDEX[square]]]
+        return score
+
+    def check_time(self):
+        """
+        Raises SearchTimeout if the search's time limit has run out
+        :return: None
+        """
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+
+    @staticmethod
+    def score_to_table(score, ply):
+        """
+        Converts a mate score from "mate in so many moves from the root" to "mate in so many moves from this
+        position" before it's stored, so it stays right when the position is reached by a different path
+        :param score: the score found
+        :param ply: the number of moves made since the root of the search
+        :return: the score to store
+        """
+        if score >= MATE_SCORE - 1000:
+            return score + ply
+        if score <= -MATE_SCORE + 1000:
+            return score - ply
+        return score
+
+    @staticmethod
+    def score_from_table(score, ply):
+        """
+        The reverse of score_to_table, for a score read back from the table
+        :param score: the stored score
+        :param ply: the number of moves made since the root of the search
+        :return: the score relative to the root of the search
+        """
+        if score >= MATE_SCORE - 1000:
+            return score - ply
+        if score <= -MATE_SCORE + 1000:
+            return score + ply
+        return score
+
+
+# The Piece class for each piece type, indexed by type
+PIECE_CLASSES = (None, General, Guard, Elephant, Horse, Chariot, Cannon, Soldier)
+
+# The board of a new game, which Board.reset copies the starting position from
+STARTING_BOARD = JanggiGame().get_board()
+
+
+class LatencyHistogram:
+    """
+    A histogram of how long something took. The buckets double in width - bucket 0 counts times under 1 microsecond,
+    bucket 1 times under 2 microseconds, bucket 2 times under 4 microseconds and so on, with the last bucket also
+    counting anything slower - so a few dozen buckets cover everything from a single attack test to a long search.
+    The number of times, their total and the slowest are kept as well.
+    """
+    BUCKETS = 32
+
+    def __init__(self):
+        """
+        Initializes an empty histogram
+        """
+        self._buckets = [0] * self.BUCKETS
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+
+    def record(self, seconds):
+        """
+        Adds a time to the histogram
+        :param seconds: the time taken, in seconds
+        :return: None
+        """
+        self._buckets[min(int(seconds * 1000000).bit_length(), self.BUCKETS - 1)] += 1
+        self._count += 1
+        self._total += seconds
+        if seconds > self._max:
+            self._max = seconds
+
+    def merge(self, other):
+        """
+        Adds another histogram's times to this one
+        :param other: the LatencyHistogram object to add
+        :return: None
+        """
+        for bucket, count in enumerate(other._buckets):
+            self._buckets[bucket] += count
+        self._count += other._count
+        self._total += other._total
+        self._max = max(self._max, other._max)
+
+    def get_count(self):
+        """
+        Returns the number of times recorded
+        """
+        return self._count
+
+    def get_total(self):
+        """
+        Returns the total of the times recorded, in seconds
+        """
+        return self._total
+
+    def get_max(self):
+        """
+        Returns the slowest time recorded, in seconds
+        """
+        return self._max
+
+    def get_percentile(self, fraction):
+        """
+        Returns the time that the given fraction of the recorded times were under - as the top of the bucket it falls
+        in, so it can be up to twice the real value
+        :param fraction: e.g. 0.99 for the 99th percentile
+        :return: the time in seconds, or 0.0 if nothing has been recorded
+        """
+        target = fraction * self._count
+        seen = 0
+        for bucket, count in enumerate(self._buckets):
+            seen += count
+            if count and seen >= target:
+                return min((1 << bucket) / 1000000, self._max)
+        return 0.0
+
+    def as_dict(self):
+        """
+        Returns the histogram as a dictionary of plain values, ready to be sent to a metrics system - the count, the
+        total, mean, 50th percentile, 99th percentile and slowest time in seconds, and the bucket counts
+        """
+        return {
+            'count': self._count,
+            'total': self._total,
+            'mean': self._total / self._count if self._count else 0.0,
+            'p50': self.get_percentile(0.5),
+            'p99': self.get_percentile(0.99),
+            'max': self._max,
+            'buckets': list(self._buckets)
+        }
+
+
+class Instrumentation:
+    """
+    A set of named counters and latency histograms (see LatencyHistogram), filled in by the instrumented methods
+    while instrumentation is enabled (see enable_instrumentation). Every JanggiGame and Board object gets its own set
+    the first time one of its instrumented methods runs, and the module's INSTRUMENTATION holds the totals over every
+    game.
+
+    Instrumented methods running at the same time in several threads can occasionally lose a count, since the
+    counters aren't locked - the numbers are meant for monitoring, not accounting.
+    """
+    def __init__(self):
+        """
+        Initializes an empty set of counters and histograms
+        """
+        self._counters = {}
+        self._histograms = {}
+
+    def count(self, name):
+        """
+        Adds one to a counter
+        :param name: the counter's name, e.g. "check_test"
+        :return: None
+        """
+        self._counters[name] = self._counters.get(name, 0) + 1
+
+    def record(self, phase, seconds):
+        """
+        Adds a time to a phase's latency histogram
+        :param phase: the phase's name - the name of the method that was timed, e.g. "check_checkmate"
+        :param seconds: the time taken, in seconds
+        :return: None
+        """
+        histogram = self._histograms.get(phase)
+        if histogram is None:
+            histogram = self._histograms[phase] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def merge(self, other):
+        """
+        Adds another set of counters and histograms to this one
+        :param other: the Instrumentation object to add
+        :return: None
+        """
+        for name, count in other._counters.items():
+            self._counters[name] = self._counters.get(name, 0) + count
+        for phase, histogram in other._histograms.items():
+            if phase not in self._histograms:
+                self._histograms[phase] = LatencyHistogram()
+            self._histograms[phase].merge(histogram)
+
+    def get_counters(self):
+        """
+        Returns a copy of the counters, as a dictionary of names to counts
+        """
+        return dict(self._counters)
+
+    def get_histograms(self):
+        """
+        Returns the Instrumentation's own dictionary of phase names to LatencyHistogram objects
+        """
+        return self._histograms
+
+    def as_dict(self):
+        """
+        Returns everything as a dictionary of plain values, ready to be sent to a metrics system - "counters", a
+        dictionary of counter names to counts, and "phases", a dictionary of phase names to histograms (see
+        LatencyHistogram.as_dict)
+        """
+        return {'counters': dict(self._counters),
+                'phases': {phase: histogram.as_dict() for phase, histogram in self._histograms.items()}}
+
+    def clear(self):
+        """
+        Resets every counter and histogram
+        :return: None
+        """
+        self._counters = {}
+        self._histograms = {}
+
+
+# The totals of every game's counters and histograms while instrumentation is enabled - the global registry that
+# instrumentation_stats reports and reset_instrumentation clears
+INSTRUMENTATION = Instrumentation()
+
+
+def count_generator_call(game, start, board):
+    """
+    Names the counter for a call to one of the "make_x_move" methods - the type of piece the moves are generated for,
+    e.g. "generate.chariot" (generals and guards share a method, but are counted apart)
+    """
+    return 'generate.' + str(board.get_tiles()[start])
+
+
+# What enable_instrumentation measures - each method it wraps, with the counter a call adds to (a name, a function of
+# the call's arguments that returns a name, or None) and whether the call's running time is recorded in a histogram
+# under the method's name. Hypothetical moves are made in place on the board rather than on copies of it, so the
+# Board's push method is counted where copies used to be made.
+INSTRUMENTED_METHODS = (
+    (JanggiGame, 'make_move', None, True),
+    (JanggiGame, 'is_move_valid', None, True),
+    (JanggiGame, 'check_checkmate', None, True),
+    (JanggiGame, 'legal_moves', None, True),
+    (JanggiGame, 'pseudo_legal_moves', None, True),
+    (JanggiGame, 'best_move', None, True),
+    (JanggiGame, 'find_evasions', 'checkmate_search', False),
+    (JanggiGame, 'is_square_attacked', 'check_test', False),
+    (JanggiGame, 'exposes_general', 'check_test', False),
+    (JanggiGame, 'make_general_or_guard_move', count_generator_call, False),
+    (JanggiGame, 'make_soldier_move', count_generator_call, False),
+    (JanggiGame, 'make_cannon_move', count_generator_call, False),
+    (JanggiGame, 'make_chariot_move', count_generator_call, False),
+    (JanggiGame, 'make_horse_move', count_generator_call, False),
+    (JanggiGame, 'make_elephant_move', count_generator_call, False),
+    (Board, 'push', 'board_push', False),
+)
+
+# The methods enable_instrumentation replaced, by (class, name), so that disable_instrumentation can put them back
+UNINSTRUMENTED_METHODS = {}
+
+
+def instrument_method(method, name, counter, timed):
+    """
+    Wraps a method so that each call adds to a counter, or records its running time, or both - in the Instrumentation
+    of the object the method is called on and in the module's INSTRUMENTATION. Only used by enable_instrumentation.
+    :param method: the function to wrap
+    :param name: the method's name, which is also the name of its phase
+    :param counter: the counter to add to - a name, a function of the call's arguments, or None
+    :param timed: whether to record the call's running time
+    :return: the wrapping function
+    """
+    def instrumented(self, *args, **kwargs):
+        stats = self._instrumentation
+        if stats is None:
+            stats = self._instrumentation = Instrumentation()
+        if counter is not None:
+            counter_name = counter if isinstance(counter, str) else counter(self, *args, **kwargs)
+            stats.count(counter_name)
+            INSTRUMENTATION.count(counter_name)
+        if not timed:
+            return method(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            stats.record(name, elapsed)
+            INSTRUMENTATION.record(name, elapsed)
+
+    instrumented.__name__ = method.__name__
+    instrumented.__doc__ = method.__doc__
+    instrumented.__wrapped__ = method
+    return instrumented
+
+
+def enable_instrumentation():
+    """
+    Starts counting and timing the methods listed in INSTRUMENTED_METHODS, for every game. The methods are replaced on
+    their classes by wrapped versions, so that while instrumentation is disabled - the default - the methods run
+    exactly as written, at no cost at all. Enabling it again while it's enabled does nothing.
+    :return: None
+    """
+    for cls, name, counter, timed in INSTRUMENTED_METHODS:
+        if (cls, name) not in UNINSTRUMENTED_METHODS:
+            method = cls.__dict__[name]
+            UNINSTRUMENTED_METHODS[(cls, name)] = method
+            setattr(cls, name, instrument_method(method, name, counter, timed))
+
+
+def disable_instrumentation():
+    """
+    Stops counting and timing, putting the original methods back. The counts and times so far are kept.
+    :return: None
+    """
+    for (cls, name), method in UNINSTRUMENTED_METHODS.items():
+        setattr(cls, name, method)
+    UNINSTRUMENTED_METHODS.clear()
+
+
+def is_instrumentation_enabled():
+    """
+    Returns True if instrumentation is enabled (see enable_instrumentation)
+    """
+    return bool(UNINSTRUMENTED_METHODS)
+
+
+def instrumentation_stats():
+    """
+    Returns the totals of every game's counters and histograms, as a dictionary of plain values (see
+    Instrumentation.as_dict)
+    """
+    return INSTRUMENTATION.as_dict()
+
+
+def reset_instrumentation():
+    """
+    Resets the totals kept in the module's INSTRUMENTATION. Each game's own counts (see JanggiGame.stats) are kept.
+    :return: None
+    """
+    INSTRUMENTATION.clear()
+
+
+def search_position(position, depth):
+    """
+    Searches a position to a fixed depth and returns its score. This is the work done in each worker process by
+    JanggiGame.analyze - it is a module-level function so that it can be sent to another process.
+    :param position: a position encoded by JanggiGame.encode_position
+    :param depth: the number of moves ahead to search
+    :return: the score of the position from the point of view of the player to move
+    """
+    game = JanggiGame()
+    game.decode_position(position)
+    return Search(game).score_position(depth)
+
+
+def replay_games(move_sequences, positions=None):
+    """
+    Replays many recorded games one after another, checking every move with make_move, and yields the result of
+    each game as soon as it has been replayed. A single JanggiGame object is used for all of them - between games,
+    its moves are taken back with its "rewind" method rather than creating a new Board and new Piece objects. A game
+    with a starting position of its own is set up with decode_position, and the next game from the usual starting
+    position with reset.
+    :param move_sequences: an iterable of games, each an iterable of (start_position, end_position) moves from the
+    game's starting position - a pass is a move from the general's tile to itself
+    :param positions: optionally, an iterable of the games' starting positions, in the same order - each made by
+    JanggiGame.encode_position, or None for the usual starting position. By default, every game starts from the
+    usual starting position.
+    :return: a generator of (game_state, illegal_move, blue_in_check, red_in_check) tuples, one per game, in the
+    same order as the games. The game state and check flags are those after the last legal move; illegal_move is the
+    index of the first move make_move rejected, at which point the rest of the game is skipped, or None if every move
+    was legal.
+    """
+    game = JanggiGame()
+    players = game.get_player_dictionary()
+    if positions is not None:
+        positions = iter(positions)
+    custom_start = False
+    for moves in move_sequences:
+        position = next(positions) if positions is not None else None
+        if position is not None:
+            game.decode_position(position)
+            custom_start = True
+        elif custom_start:
+            game.reset()
+            custom_start = False
+        illegal_move = None
+        for index, (start, end) in enumerate(moves):
+            if not game.make_move(start, end):
+                illegal_move = index
+                break
+        yield (game.get_game_state(), illegal_move, players['blue'].get_check_status(),
+               players['red'].get_check_status())
+        game.rewind()
+
+
+def parse_moves(text):
+    """
+    Reads a game written as a line of moves in algebraic notation, each a start and end tile joined by a dash and
+    separated by spaces - e.g. "c7-c6 a4-a5 e9-e9", where the last move is a pass
+    :param text: the line of moves
+    :return: a list of (start_position, end_position) tuples
+    :raises ValueError: if a move isn't two tiles on the board joined by a dash
+    """
+    moves = []
+    for word in text.split():
+        move = tuple(word.split('-'))
+        if len(move) != 2 or move[0] not in SQUARE_INDEX or move[1] not in SQUARE_INDEX:
+            raise ValueError('unreadable move ' + repr(word))
+        moves.append(move)
+    return moves
+
+
+def format_moves(moves):
+    """
+    Writes a game's moves as a line in the form read by parse_moves
+    :param moves: an iterable of (start_position, end_position) tuples
+    :return: the moves as a string, e.g. "c7-c6 a4-a5"
+    """
+    return ' '.join(start + '-' + end for start, end in moves)
+
+
+# The counts replay_chunk and replay_archive keep - games replayed, moves played, games won by each side, games with
+# no winner, games with an illegal move, and lines that couldn't be read as a game
+REPLAY_STATISTICS = ('games', 'moves', 'blue_won', 'red_won', 'unfinished', 'illegal', 'unreadable')
+
+
+def replay_chunk(first_line, lines):
+    """
+    Replays a chunk of lines from a text game-record file with replay_games. This is the work done in each worker
+    process by replay_archive - it is a module-level function so that it can be sent to another process, and it sends
+    back only counts and errors rather than a result for every game.
+    :param first_line: the line number of the first line in the file, counting from 1
+    :param lines: the lines, each a game in the form read by read_text_records. Blank lines and lines starting with
+    "#" are skipped.
+    :return: a (first_line, statistics, errors) tuple. The statistics are a dictionary of counts, with the keys in
+    REPLAY_STATISTICS; the errors are a list of (line_number, message) tuples for each game that couldn't be read or
+    had an illegal move.
+    """
+    errors = []
+    line_numbers = []
+    games = []
+    for line_number, line in enumerate(lines, first_line):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            games.append(parse_record(line))
+        except ValueError as error:
+            errors.append((line_number, str(error)))
+            continue
+        line_numbers.append(line_number)
+    unreadable = len(errors)
+    statistics = count_replays(line_numbers, games, errors)
+    statistics['unreadable'] = unreadable
+    return first_line, statistics, errors
+
+
+def replay_record_chunk(first_game, games):
+    """
+    Replays a chunk of games from a binary game-record file with replay_games - the counterpart of replay_chunk for
+    games already read with read_records
+    :param first_game: the number of the first game in the file, counting from 1
+    :param games: a list of (position, moves) tuples, as read by read_records
+    :return: a (first_game, statistics, errors) tuple, as returned by replay_chunk but with games numbered in place
+    of lines
+    """
+    errors = []
+    statistics = count_replays(range(first_game, first_game + len(games)), games, errors)
+    return first_game, statistics, errors
+
+
+def count_replays(numbers, games, errors):
+    """
+    Replays games with replay_games and counts the results, for replay_chunk and replay_record_chunk
+    :param numbers: the line or game number of each game, for the errors
+    :param games: a list of (position, moves) tuples
+    :param errors: the list to add a (number, message) tuple to for each game with an illegal move
+    :return: a dictionary of counts, with the keys in REPLAY_STATISTICS
+    """
+    statistics = dict.fromkeys(REPLAY_STATISTICS, 0)
+    results = replay_games((moves for _, moves in games), (position for position, _ in games))
+    for number, (_, moves), result in zip(numbers, games, results):
+        game_state, illegal_move = result[0], result[1]
+        statistics['games'] += 1
+        statistics['moves'] += len(moves) if illegal_move is None else illegal_move
+        if illegal_move is not None:
+            statistics['illegal'] += 1
+            start, end = moves[illegal_move]
+            errors.append((number, 'move ' + str(illegal_move + 1) + ' (' + start + '-' + end + ') is illegal'))
+        elif game_state == 'BLUE_WON':
+            statistics['blue_won'] += 1
+        elif game_state == 'RED_WON':
+            statistics['red_won'] += 1
+        else:
+            statistics['unfinished'] += 1
+    return statistics
+
+
+def replay_archive_chunks(path, workers=None, chunk_size=1000, ordered=True, executor=None):
+    """
+    Replays a game-record file by splitting it into chunks and replaying the chunks in separate processes - chunks
+    of lines with replay_chunk for a text file, or chunks of games with replay_record_chunk for a binary one (see
+    is_binary_records). The file is read as the chunks are handed out, with only a few chunks per worker waiting at
+    any time, so it is never loaded into memory all at once.
+    :param path: the path of the game-record file
+    :param workers: the number of worker processes to start, if no executor is given - by default, one per core
+    :param chunk_size: the number of lines, or of games for a binary file, in each chunk
+    :param ordered: if True, chunk results are yielded in the order of the file; if False, as soon as each chunk is
+    finished
+    :param executor: a concurrent.futures executor to run the chunks on. By default, a ProcessPoolExecutor is started
+    for the call and shut down at the end of it.
+    :return: a generator of the (first_line, statistics, errors) tuples returned by replay_chunk, or the
+    (first_game, statistics, errors) tuples returned by replay_record_chunk for a binary file
+    :raises ValueError: if a binary file isn't a game-record file or a record is cut short or damaged
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    most_waiting = 2 * (workers or os.cpu_count() or 1)
+    waiting = deque()
+    binary = is_binary_records(path)
+    replay = replay_record_chunk if binary else replay_chunk
+    try:
+        with open(path, 'rb' if binary else 'r') as records:
+            chunk = []
+            first_number = 1
+            for number, item in enumerate(read_records(records) if binary else records, 1):
+                chunk.append(item)
+                if len(chunk) == chunk_size:
+                    waiting.append(executor.submit(replay, first_number, chunk))
+                    chunk = []
+                    first_number = number + 1
+                    if len(waiting) >= most_waiting:
+                        yield from collect_chunks(waiting, ordered, most_waiting - 1)
+            if chunk:
+                waiting.append(executor.submit(replay, first_number, chunk))
+        yield from collect_chunks(waiting, ordered, 0)
+    finally:
+        # waiting for the workers to exit, rather than leaving them to the interpreter's shutdown - by now they have
+        # either finished or been cancelled
+        if own_executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def collect_chunks(waiting, ordered, keep):
+    """
+    Waits for chunks handed out by replay_archive_chunks to finish, until no more than a given number are left
+    waiting
+    :param waiting: the deque of futures for the chunks, oldest first - finished ones are removed from it
+    :param ordered: if True, chunks are collected oldest first; if False, in the order they finish
+    :param keep: the number of chunks that can be left waiting
+    :return: a generator of the results of the finished chunks
+    """
+    while len(waiting) > keep:
+        if ordered:
+            yield waiting.popleft().result()
+        else:
+            done, _ = wait(waiting, return_when=FIRST_COMPLETED)
+            for future in done:
+                waiting.remove(future)
+                yield future.result()
+
+
+def replay_archive(path, workers=None, chunk_size=1000, ordered=True, executor=None):
+    """
+    Replays a game-record file with replay_archive_chunks and adds up the results
+    :param path: the path of the game-record file
+    :param workers: the number of worker processes to start, if no executor is given - by default, one per core
+    :param chunk_size: the number of lines handed to a worker at a time
+    :param ordered: if True, the errors are listed in the order of the file
+    :param executor: a concurrent.futures executor to run the chunks on
+    :return: a tuple of the statistics for the whole file - a dictionary with the keys in REPLAY_STATISTICS - and a
+    list of (line_number, message) tuples, one for each game that couldn't be read or had an illegal move. For a
+    binary file, games are numbered in place of lines.
+    :raises ValueError: if a binary file isn't a game-record file or a record is cut short or damaged
+    """
+    totals = dict.fromkeys(REPLAY_STATISTICS, 0)
+    errors = []
+    for _, statistics, chunk_errors in replay_archive_chunks(path, workers, chunk_size, ordered, executor):
+        for key in REPLAY_STATISTICS:
+            totals[key] += statistics[key]
+        errors.extend(chunk_errors)
+    return totals, errors
+
+
+# Game-record files. A binary file starts with RECORD_MAGIC, followed by one record per game: a flag byte, which is
+# RECORD_CUSTOM_START if the game didn't begin from the usual starting position, in which case the position follows
+# in the 91-byte form made by JanggiGame.encode_position; then the number of moves, as two bytes (big-endian); then
+# two bytes for each move - the index in SQUARES of its start tile and of its end tile, which are the same for a pass.
+# A text file has one game per line, in the form read by parse_moves; a game that didn't begin from the usual
+# starting position has its position first, written as "position:" followed by the 91 bytes in hexadecimal. A game
+# with no moves from the usual starting position is written as RECORD_EMPTY_GAME, since blank lines are skipped.
+RECORD_MAGIC = b'JGR1'
+RECORD_STANDARD_START = 0
+RECORD_CUSTOM_START = 1
+RECORD_EMPTY_GAME = '-'
+
+# The piece codes that may appear in a recorded position - EMPTY, or a piece type with or without RED
+POSITION_CODES = frozenset([EMPTY] + [piece_type + side for piece_type in range(GENERAL, SOLDIER + 1)
+                                      for side in (0, RED)])
+
+
+def write_records(stream, games):
+    """
+    Writes games to a binary game-record file, one at a time as they come from the iterable, so that games can be
+    written as they are produced rather than collected first
+    :param stream: a binary file object open for writing
+    :param games: an iterable of (position, moves) tuples - the starting position, as made by
+    JanggiGame.encode_position, or None for the usual starting position, and a list of (start_position,
+    end_position) moves
+    :return: the number of games written
+    """
+    stream.write(RECORD_MAGIC)
+    count = 0
+    for position, moves in games:
+        if position is None:
+            header = bytes((RECORD_STANDARD_START,))
+        else:
+            header = bytes((RECORD_CUSTOM_START,)) + position
+        body = bytes(SQUARE_INDEX[square] for move in moves for square in move)
+        stream.write(header + (len(body) // 2).to_bytes(2, 'big') + body)
+        count += 1
+    return count
+
+
+def read_records(stream):
+    """
+    Reads the games of a binary game-record file, one at a time - only the bytes of the game being read are held in
+    memory, so files of any size can be read
+    :param stream: a binary file object open for reading, at the start of the file
+    :return: a generator of (position, moves) tuples, in the form taken by write_records
+    :raises ValueError: if the file isn't a game-record file, a record is cut short or damaged, or a position can't be
+    read
+    """
+    if stream.read(len(RECORD_MAGIC)) != RECORD_MAGIC:
+        raise ValueError('not a game-record file')
+    while True:
+        flag = stream.read(1)
+        if not flag:
+            return
+        position = None
+        if flag[0] == RECORD_CUSTOM_START:
+            position = check_position(read_exactly(stream, 91))
+        elif flag[0] != RECORD_STANDARD_START:
+            raise ValueError('damaged game record')
+        body = read_exactly(stream, 2 * int.from_bytes(read_exactly(stream, 2), 'big'))
+        if any(index >= len(SQUARES) for index in body):
+            raise ValueError('damaged game record')
+        yield position, [(SQUARES[body[index]], SQUARES[body[index + 1]]) for index in range(0, len(body), 2)]
+
+
+def read_exactly(stream, size):
+    """
+    Reads a given number of bytes from a game-record file
+    :param stream: a binary file object open for reading
+    :param size: the number of bytes to read
+    :return: the bytes read
+    :raises ValueError: if the file ends first
+    """
+    data = stream.read(size)
+    if len(data) != size:
+        raise ValueError('game record cut short')
+    return data
+
+
+def check_position(position):
+    """
+    Checks a starting position read from a game-record file, before it is handed to JanggiGame.decode_position
+    :param position: the bytes of the position, in the form made by JanggiGame.encode_position
+    :return: the position
+    :raises ValueError: if the position isn't 91 bytes long, holds a piece code that isn't in POSITION_CODES, doesn't
+    have exactly one general of each color, or doesn't end with 0 or 1 for the player to move
+    """
+    if len(position) != 91 or not POSITION_CODES.issuperset(position[:90]) or position[90] not in (0, 1):
+        raise ValueError('unreadable position')
+    # the Board keeps a single tile for each player's general, and check detection needs it to be there
+    squares = position[:90]
+    if squares.count(GENERAL) != 1 or squares.count(GENERAL + RED) != 1:
+        raise ValueError('unreadable position')
+    return position
+
+
+def write_text_records(stream, games):
+    """
+    Writes games to a text game-record file, one line per game, in the form read by read_text_records
+    :param stream: a text file object open for writing
+    :param games: an iterable of (position, moves) tuples, as taken by write_records
+    :return: the number of games written
+    """
+    count = 0
+    for position, moves in games:
+        line = format_moves(moves)
+        if position is not None:
+            line = ('position:' + position.hex() + ' ' + line).rstrip()
+        stream.write((line or RECORD_EMPTY_GAME) + '\n')
+        count += 1
+    return count
+
+
+def read_text_records(stream):
+    """
+    Reads the games of a text game-record file, one line at a time. Blank lines and lines starting with "#" are
+    skipped.
+    :param stream: a text file object open for reading
+    :return: a generator of (position, moves) tuples, in the form taken by write_records
+    :raises ValueError: if a line can't be read as a game
+    """
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        yield parse_record(line)
+
+
+def parse_record(line):
+    """
+    Reads one game from a line of a text game-record file - its moves, in the form read by parse_moves, after its
+    starting position if it didn't begin from the usual one
+    :param line: the line, with no surrounding whitespace
+    :return: a (position, moves) tuple, in the form taken by write_records
+    :raises ValueError: if the position or a move can't be read
+    """
+    position = None
+    if line.startswith('position:'):
+        word, _, line = line.partition(' ')
+        try:
+            position = bytes.fromhex(word[len('position:'):])
+        except ValueError:
+            raise ValueError('unreadable position')
+        check_position(position)
+    if line == RECORD_EMPTY_GAME:
+        return position, []
+    return position, parse_moves(line)
+
+
+# Opening-book files - see OpeningBook
+BOOK_MAGIC = b'JGB1'
+BOOK_ENTRY = struct.Struct('>QBBII')
+DEFAULT_BOOK_PLIES = 20
+
+
+def build_opening_book(path, games, plies=DEFAULT_BOOK_PLIES):
+    """
+    Builds an opening-book file from recorded games, by replaying each one and counting, for each of its first
+    moves, the position it was played from, the move, and whether the player who made it won the game. A game is
+    only used up to its first illegal move.
+    :param path: the path of the book file to write
+    :param games: an iterable of (position, moves) tuples, as read by read_records or read_text_records
+    :param plies: the number of moves at the start of each game to put in the book
+    :return: the number of entries written
+    """
+    counts = {}
+    standard_game = JanggiGame()
+    for position, moves in games:
+        if position is None:
+            game = standard_game
+        else:
+            game = JanggiGame()
+            game.decode_position(position)
+        board = game.get_board()
+        played = []
+        for start, end in moves:
+            key = board.hash_key()
+            color = game.get_turn_color()
+            if not game.make_move(start, end):
+                break
+            if len(played) < plies:
+                played.append((key, SQUARE_INDEX[start], SQUARE_INDEX[end], color))
+        winner = game.get_game_state()
+        for key, start, end, color in played:
+            entry = counts.setdefault((key, start, end), [0, 0])
+            entry[0] += 1
+            if winner == color.upper() + '_WON':
+                entry[1] += 1
+        if position is None:
+            game.rewind()
+
+    with open(path, 'wb') as book_file:
+        book_file.write(BOOK_MAGIC)
+        for (key, start, end), (played_count, wins) in sorted(counts.items()):
+            book_file.write(BOOK_ENTRY.pack(key, start, end, played_count, wins))
+    return len(counts)
+
+
+def open_records(path):
+    """
+    Reads the games of a game-record file, which may be binary or text - binary files are recognized by starting
+    with RECORD_MAGIC
+    :param path: the path of the file
+    :return: a generator of (position, moves) tuples, as from read_records or read_text_records
+    """
+    if is_binary_records(path):
+        with open(path, 'rb') as records:
+            yield from read_records(records)
+    else:
+        with open(path) as records:
+            yield from read_text_records(records)
+
+
+def is_binary_records(path):
+    """
+    Checks whether a game-record file is binary, by whether it starts with RECORD_MAGIC
+    :param path: the path of the file
+    :return: True for a binary file, False for a text one
+    """
+    with open(path, 'rb') as records:
+        return records.read(len(RECORD_MAGIC)) == RECORD_MAGIC
+
+
+# Positions with known perft counts, used to check the move generators - each is a name, the moves that reach it
+# from the starting position, and the number of positions reached from it in 1, 2, 3... moves. Between them they
+# cover cannon screens, chariots and cannons on the palace diagonals, blocked horses and elephants, a soldier on the
+# palace diagonals, passes, and getting out of check.
+PERFT_POSITIONS = (
+    ('opening', (), (32, 1024, 33506)),
+    ('middle game', (('b10', 'd7'), ('b1', 'd4'), ('d7', 'f4'), ('i1', 'i3'), ('h10', 'g8'), ('h1', 'g3'),
+                     ('h8', 'e8'), ('c1', 'd3'), ('e8', 'e4'), ('g1', 'e4'), ('c10', 'd8'), ('a1', 'c1'),
+                     ('b8', 'f8'), ('h3', 'e3'), ('f8', 'f1'), ('e3', 'e7')),
+     (49, 2210, 100409)),
+    ('cannon in the palace', (('b10', 'd7'), ('b1', 'd4'), ('c10', 'd8'), ('c1', 'd3'), ('d7', 'f4'), ('d3', 'f4'),
+                              ('h10', 'g8'), ('f4', 'e6'), ('d8', 'e6'), ('a1', 'a3'), ('e6', 'd4'), ('c4', 'd4'),
+                              ('h8', 'd8'), ('h1', 'g3'), ('d8', 'd1'), ('i1', 'i3'), ('e7', 'e6'), ('h3', 'e3'),
+                              ('g10', 'e7'), ('e3', 'e6')),
+     (9, 287, 11295)),
+    ('soldier in the palace', (('g7', 'g6'), ('e2', 'e2'), ('g6', 'g5'), ('i1', 'i2'), ('g5', 'g4'), ('e2', 'e2'),
+                               ('g4', 'g3'), ('h1', 'i3'), ('g3', 'f3')),
+     (4, 128, 4111)),
+)
+
+
+def perft_benchmark(max_depth=3, positions=PERFT_POSITIONS):
+    """
+    Runs perft on each reference position to each depth up to max_depth, checking the counts against the known ones
+    and timing them. Any change to the move generators should leave every count correct.
+    :param max_depth: the deepest perft to run on each position - deeper counts take much longer
+    :param positions: the reference positions, in the form of PERFT_POSITIONS
+    :return: a list of (name, depth, nodes, expected_nodes, seconds) tuples, one for each count run. The expected
+    count is None where the position doesn't have one for that depth.
+    """
+    results = []
+    for name, moves, counts in positions:
+        game = JanggiGame()
+        for start, end in moves:
+            if not game.make_move(start, end):
+                raise ValueError('illegal move ' + start + '-' + end + ' in perft position ' + repr(name))
+        for depth in range(1, max_depth + 1):
+            started = time.perf_counter()
+            nodes = game.perft(depth)
+            seconds = time.perf_counter() - started
+            expected = counts[depth - 1] if depth <= len(counts) else None
+            results.append((name, depth, nodes, expected, seconds))
+    return results
+
+
+def main(arguments=None):
+    """
+    The command-line entry point, run with "python JanggiGame.py". The "perft" command runs perft_benchmark and
+    reports each count with its speed in nodes per second; the "divide" command prints the divide counts of the
+    position reached by a list of moves, e.g. "python JanggiGame.py divide 2 c7 c6 a4 a5"; and the "replay"
+    command checks every game in a game-record file with replay_archive_chunks, printing each error as it's found
+    and the totals at the end; and the "build-book" command builds an opening book with build_opening_book.
+    :param arguments: the command-line arguments - by default, those the program was run with
+    :return: the exit status - 1 if a perft count was wrong or a replayed game couldn't be read or had an illegal
+    move, otherwise 0
+    """
+    parser = argparse.ArgumentParser(prog='JanggiGame.py', description='Janggi move generation tools')
+    commands = parser.add_subparsers(dest='command', required=True)
+    perft_parser = commands.add_parser('perft', help='check and time the move generators on the reference positions')
+    perft_parser.add_argument('--depth', type=int, default=3, help='the deepest perft to run (default 3)')
+    divide_parser = commands.add_parser('divide', help='split a perft count up by the first move')
+    divide_parser.add_argument('depth', type=int)
+    divide_parser.add_argument('tiles', nargs='*', help='start and end tiles of the moves leading to the position')
+    replay_parser = commands.add_parser('replay', help='check every game in a game-record file')
+    replay_parser.add_argument('path', help='the game-record file, binary or text (one game per line, e.g. '
+                                             '"c7-c6 a4-a5")')
+    replay_parser.add_argument('--workers', type=int, help='the number of worker processes (default: one per core)')
+    replay_parser.add_argument('--chunk-size', type=int, default=1000,
+                               help='lines, or games in a binary file, per worker task (default 1000)')
+    replay_parser.add_argument('--unordered', action='store_true',
+                               help="report errors as soon as they're found, rather than in file order")
+    book_parser = commands.add_parser('build-book', help='build an opening book from a game-record file')
+    book_parser.add_argument('records', help='the game-record file, binary or text')
+    book_parser.add_argument('book', help='the opening-book file to write')
+    book_parser.add_argument('--plies', type=int, default=DEFAULT_BOOK_PLIES,
+                             help='the number of moves from each game to use (default %d)' % DEFAULT_BOOK_PLIES)
+    options = parser.parse_args(arguments)
+
+    if options.command == 'perft':
+        status = 0
+        for name, depth, nodes, expected, seconds in perft_benchmark(options.depth):
+            if expected is None:
+                verdict = 'unchecked'
+            elif nodes == expected:
+                verdict = 'ok'
+            else:
+                verdict = 'WRONG, expected ' + str(expected)
+                status = 1
+            speed = nodes / seconds if seconds else 0
+            print('%-22s depth %d %10d nodes %10.0f nodes/s  %s' % (name, depth, nodes, speed, verdict))
+        return status
+
+    if options.command == 'replay':
+        totals = dict.fromkeys(REPLAY_STATISTICS, 0)
+        started = time.perf_counter()
+        unit = 'game' if is_binary_records(options.path) else 'line'
+        try:
+            for _, statistics, errors in replay_archive_chunks(options.path, options.workers, options.chunk_size,
+                                                                not options.unordered):
+                for number, message in errors:
+                    print('%s %d: %s' % (unit, number, message))
+                for key in REPLAY_STATISTICS:
+                    totals[key] += statistics[key]
+        except ValueError as error:
+            print(str(error))
+            return 1
+        seconds = time.perf_counter() - started
+        print(', '.join('%s %d' % (key.replace('_', ' '), totals[key]) for key in REPLAY_STATISTICS))
+        print('%.1f seconds, %.0f games/s' % (seconds, totals['games'] / seconds if seconds else 0))
+        return 1 if totals['illegal'] or totals['unreadable'] else 0
+
+    if options.command == 'build-book':
+        try:
+            entries = build_opening_book(options.book, open_records(options.records), options.plies)
+        except ValueError as error:
+            parser.error(str(error))
+        print('%d entries written to %s' % (entries, options.book))
+        return 0
+
+    game = JanggiGame()
+    tiles = options.tiles
+    if len(tiles) % 2:
+        parser.error('moves need a start and an end tile')
+    for start, end in zip(tiles[0::2], tiles[1::2]):
+        if not game.make_move(start, end):
+            parser.error('illegal move ' + start + '-' + end)
+    counts = game.divide(options.depth)
+    for (start, end), nodes in sorted(counts.items()):
+        print(start + '-' + end, nodes)
+    print('total', sum(counts.values()))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
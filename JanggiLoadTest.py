@@ -0,0 +1,215 @@
+# Description: A load test for JanggiServer. It opens many games on the server at once and keeps every one of them
+# playing, each with one move in flight at a time, then reports how many moves per second the server sustained and
+# how long the moves took to answer (the 50th, 99th percentile and slowest).
+#
+# The games replay random legal games worked out before the test starts, so the client spends its time sending moves
+# rather than choosing them. By default the server is started in a separate process, so that it doesn't share a
+# Python interpreter with the client; pass --host and --port to test a server that is already running instead.
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import time
+
+from JanggiGame import JanggiGame
+from JanggiServer import DEFAULT_HOST, run_server
+
+
+DEFAULT_GAMES = 10000
+DEFAULT_CONNECTIONS = 100
+DEFAULT_DURATION = 30.0
+
+
+def make_scripts(count, plies, seed=0):
+    """
+    Plays random legal games to be replayed against the server
+    :param count: how many games to play
+    :param plies: the most moves to play in each game - a game also ends at checkmate
+    :param seed: the seed for the random choice of moves
+    :return: a list of lists of (start_position, end_position) moves
+    """
+    generator = random.Random(seed)
+    scripts = []
+    for _ in range(count):
+        game = JanggiGame()
+        moves = []
+        for _ in range(plies):
+            legal_moves = game.legal_moves()
+            if not legal_moves:
+                break
+            move = generator.choice(legal_moves)
+            game.make_move(*move)
+            moves.append(move)
+        scripts.append(moves)
+    return scripts
+
+
+class LoadClient:
+    """
+    One connection to the server. Any number of requests can be in flight at once - each is sent with its own id,
+    and a reading task hands each response to whoever is waiting for its id.
+    """
+    def __init__(self, reader, writer):
+        """
+        Wraps a connection and starts reading its responses
+        :param reader: the connection's asyncio StreamReader
+        :param writer: the connection's asyncio StreamWriter
+        """
+        self._reader = reader
+        self._writer = writer
+        self._waiting = {}
+        self._next_id = 0
+        self._reading = asyncio.create_task(self.read_responses())
+
+    async def request(self, message):
+        """
+        Sends a request and waits for its response
+        :param message: the request, as a dictionary
+        :return: the response, as a dictionary
+        """
+        self._next_id += 1
+        message['id'] = self._next_id
+        response = asyncio.get_running_loop().create_future()
+        self._waiting[self._next_id] = response
+        self._writer.write(json.dumps(message, separators=(',', ':')).encode() + b'\n')
+        await self._writer.drain()
+        return await response
+
+    async def read_responses(self):
+        """
+        Reads responses until the connection closes
+        :return: None
+        """
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            self._waiting.pop(response['id']).set_result(response)
+        for response in self._waiting.values():
+            response.set_exception(ConnectionError('connection closed'))
+
+    async def close(self):
+        """
+        Closes the connection
+        :return: None
+        """
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._reading.cancel()
+
+
+async def play_games(client, scripts, deadline, latencies, generator):
+    """
+    Keeps one game at a time going on the server until the deadline - replaying a script, then starting a new game
+    with another script - and records how long each move took to answer
+    :param client: the LoadClient to send requests on
+    :param scripts: the games to replay, from make_scripts
+    :param deadline: the time.perf_counter() value to stop at
+    :param latencies: a list to append each move's time to answer, in seconds
+    :param generator: a random.Random object for choosing scripts
+    :return: None
+    """
+    while time.perf_counter() < deadline:
+        game_id = (await client.request({'op': 'new'}))['game']
+        for start, end in generator.choice(scripts):
+            if time.perf_counter() >= deadline:
+                break
+            sent = time.perf_counter()
+            response = await client.request({'op': 'move', 'game': game_id, 'start': start, 'end': end})
+            latencies.append(time.perf_counter() - sent)
+            if response.get('result') is not True:
+                raise RuntimeError('the server rejected {}-{}: {}'.format(start, end, response))
+        await client.request({'op': 'close', 'game': game_id})
+
+
+async def run_load_test(host, port, games=DEFAULT_GAMES, connections=DEFAULT_CONNECTIONS, duration=DEFAULT_DURATION,
+                        scripts=None):
+    """
+    Runs the load test against a server that is already listening
+    :param host: the server's address
+    :param port: the server's port
+    :param games: how many games to keep going at once
+    :param connections: how many connections to spread the games over
+    :param duration: how long to keep the games going, in seconds
+    :param scripts: the games to replay - by default, 200 random games of up to 60 moves
+    :return: a dictionary of the number of moves made, the moves per second, and the 50th percentile, 99th
+    percentile and slowest time to answer a move, in milliseconds
+    """
+    if scripts is None:
+        scripts = make_scripts(200, 60)
+    clients = [LoadClient(*await asyncio.open_connection(host, port)) for _ in range(connections)]
+    latencies = []
+    generator = random.Random(1)
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(play_games(clients[number % connections], scripts, deadline, latencies, generator)
+                           for number in range(games)))
+    elapsed = time.perf_counter() - started
+    for client in clients:
+        await client.close()
+
+    latencies.sort()
+    return {
+        'moves': len(latencies),
+        'moves_per_second': len(latencies) / elapsed,
+        'p50_ms': 1000 * latencies[len(latencies) // 2] if latencies else None,
+        'p99_ms': 1000 * latencies[int(len(latencies) * 0.99)] if latencies else None,
+        'max_ms': 1000 * latencies[-1] if latencies else None
+    }
+
+
+def serve_in_process(host, ports):
+    """
+    Runs a server in a separate process, for the load test to connect to - the port it listens on is put on the
+    given queue
+    :param host: the address to listen on
+    :param ports: a multiprocessing queue
+    :return: None
+    """
+    asyncio.run(run_server(host, 0, ready=ports.put))
+
+
+def main(arguments=None):
+    """
+    Runs the load test from the command line and prints the results
+    :param arguments: the command line arguments - by default, sys.argv
+    :return: the exit status
+    """
+    parser = argparse.ArgumentParser(description='Load test a JanggiServer with many concurrent games.')
+    parser.add_argument('--host', default=DEFAULT_HOST, help="the server's address")
+    parser.add_argument('--port', type=int, default=None,
+                        help="the server's port - by default, a server is started for the test")
+    parser.add_argument('--games', type=int, default=DEFAULT_GAMES, help='how many games to keep going at once')
+    parser.add_argument('--connections', type=int, default=DEFAULT_CONNECTIONS,
+                        help='how many connections to spread the games over')
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help='how long to run for, in seconds')
+    options = parser.parse_args(arguments)
+
+    server = None
+    port = options.port
+    if port is None:
+        ports = multiprocessing.Queue()
+        server = multiprocessing.Process(target=serve_in_process, args=(options.host, ports), daemon=True)
+        server.start()
+        port = ports.get()
+    try:
+        results = asyncio.run(run_load_test(options.host, port, options.games, options.connections,
+                                            options.duration))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+
+    print('{} games over {} connections for {:.0f}s'.format(options.games, options.connections, options.duration))
+    print('{:>12} moves    {:>10.0f} moves/s'.format(results['moves'], results['moves_per_second']))
+    if results['moves']:
+        print('p50 {:.2f} ms    p99 {:.2f} ms    max {:.2f} ms'.format(results['p50_ms'], results['p99_ms'],
+                                                                     results['max_ms']))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,394 @@
+# Description: An asyncio server that hosts many JanggiGame sessions at once. Clients connect over TCP and send one
+# JSON request per line; the server answers each with one JSON response per line. Every game in progress is kept in a
+# registry, a game's moves are made one at a time, and the work of making a move - including the check_checkmate
+# search - is handed to an executor, so that the event loop keeps serving every other game meanwhile.
+#
+# Requests are JSON objects with an "op" field, and an optional "id" field that is copied into the response, so a
+# client can have several requests in flight on one connection and match the responses up:
+#   {"op": "new"}                                          -> {"game": 17}
+#   {"op": "move", "game": 17, "start": "c7", "end": "c6"} -> {"result": true, "state": "UNFINISHED", ...}
+#   {"op": "state", "game": 17}                            -> {"state": "UNFINISHED", "turn": "red", ...}
+#   {"op": "legal", "game": 17}                            -> {"moves": [["a4", "a5"], ...]}
+#   {"op": "close", "game": 17}                            -> {"closed": true}
+# A request that can't be carried out gets a response with an "error" field instead.
+
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from JanggiGame import GamePool
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# How many requests from one connection may be waiting to be handled before the server stops reading from it - the
+# client then finds its writes blocking, rather than the server's memory filling up with its requests
+DEFAULT_MAX_PENDING = 64
+
+# How many of a connection's requests the server handles at once - requests for different games can overlap, while
+# requests for the same game are still handled in the order they arrived
+DEFAULT_CONNECTION_WORKERS = 8
+
+
+class RequestError(Exception):
+    """
+    Raised while handling a request that can't be carried out - the message is sent back as the response's "error"
+    """
+
+
+class GameSession:
+    """
+    One game hosted by the server - the JanggiGame object, and the lock that makes sure only one request works on it
+    at a time. The lock is an asyncio lock, which hands itself to waiting requests in the order they asked for it, so
+    a game's moves are made in the order they arrived.
+    """
+    def __init__(self, game_id, game):
+        """
+        Creates a session for a game in the usual starting position
+        :param game_id: the number the registry gave the game
+        :param game: the JanggiGame object
+        """
+        self._game_id = game_id
+        self._game = game
+        self._lock = asyncio.Lock()
+        self._closed = False
+
+    def get_game_id(self):
+        """
+        Returns the number the registry gave the game
+        """
+        return self._game_id
+
+    def get_game(self):
+        """
+        Returns the JanggiGame object - only to be used while holding the session's lock
+        """
+        return self._game
+
+    def get_lock(self):
+        """
+        Returns the asyncio lock to hold while working on the game
+        """
+        return self._lock
+
+    def is_closed(self):
+        """
+        Returns True once the game has been closed - its JanggiGame object may then already belong to another session
+        """
+        return self._closed
+
+    def set_closed(self):
+        """
+        Marks the game as closed
+        :return: None
+        """
+        self._closed = True
+
+    def describe(self):
+        """
+        Returns the state of the game, as sent in responses
+        :return: a dictionary of the game state, the player whose turn it is, each player's check status, and the
+        number of moves made
+        """
+        game = self._game
+        return {
+            'state': game.get_game_state(),
+            'turn': game.get_turn_color(),
+            'in_check': {'blue': game.is_in_check('blue'), 'red': game.is_in_check('red')},
+            'moves': len(game.get_move_history())
+        }
+
+
+class GameRegistry:
+    """
+    Keeps track of every game the server is hosting, by number. Games come from a GamePool, and go back to it when
+    they're closed, so a busy server mostly reuses finished games rather than creating new ones. Only the event loop's
+    thread uses the registry, so it needs no locking of its own.
+    """
+    def __init__(self, max_games=None, pool=None):
+        """
+        Creates an empty registry
+        :param max_games: the most games that may be open at once - by default, no limit
+        :param pool: the GamePool to take games from - by default, a new one
+        """
+        self._sessions = {}
+        self._next_id = 1
+        self._max_games = max_games
+        self._pool = pool if pool is not None else GamePool()
+        self._created = 0
+
+    def create(self):
+        """
+        Starts a new game
+        :return: the new GameSession object
+        """
+        if self._max_games is not None and len(self._sessions) >= self._max_games:
+            raise RequestError('too many games')
+        session = GameSession(self._next_id, self._pool.acquire())
+        self._sessions[self._next_id] = session
+        self._next_id += 1
+        self._created += 1
+        return session
+
+    def get(self, game_id):
+        """
+        Looks a game up by number
+        :param game_id: the game's number - only an int will do, since json.loads turns true into True, which
+        Python would otherwise take for game 1
+        :return: the GameSession object
+        """
+        session = self._sessions.get(game_id) if type(game_id) is int else None
+        if session is None:
+            raise RequestError('unknown game')
+        return session
+
+    def close(self, session):
+        """
+        Forgets a game and gives it back to the pool. This must only be done while holding the session's lock, so that
+        no request is working on the game; requests still waiting for the lock find the session closed.
+        :param session: the GameSession object
+        :return: None
+        """
+        if self._sessions.pop(session.get_game_id(), None) is not None:
+            session.set_closed()
+            self._pool.release(session.get_game())
+
+    def get_length(self):
+        """
+        Returns the number of games open
+        """
+        return len(self._sessions)
+
+    def get_created(self):
+        """
+        Returns the number of games started since the registry was created
+        """
+        return self._created
+
+    def get_pool(self):
+        """
+        Returns the GamePool the registry takes games from
+        """
+        return self._pool
+
+
+class GameServer:
+    """
+    The server itself. Each connection gets a task that reads its requests into a bounded queue, and a few tasks
+    that take requests off the queue and answer them (see handle_connection). Making a move, and finding a game's
+    legal moves, is done by the executor; everything else is quick enough to be done on the event loop.
+
+    The executor is a thread pool by default. A game is only ever worked on by one thread at a time, because its
+    session lock is held for the whole request.
+    """
+    def __init__(self, registry=None, executor=None, max_pending=DEFAULT_MAX_PENDING,
+                 connection_workers=DEFAULT_CONNECTION_WORKERS):
+        """
+        Creates the server - call start to begin accepting connections
+        :param registry: the GameRegistry to keep games in - by default, a new one with no limit on the number of
+        games
+        :param executor: the concurrent.futures executor to make moves on - by default, a new thread pool
+        :param max_pending: the most requests from one connection that may be waiting to be handled
+        :param connection_workers: how many of a connection's requests may be handled at once
+        """
+        self._registry = registry if registry is not None else GameRegistry()
+        self._executor = executor if executor is not None else ThreadPoolExecutor()
+        self._max_pending = max_pending
+        self._connection_workers = connection_workers
+        self._server = None
+        self._moves = 0
+
+    def get_registry(self):
+        """
+        Returns the GameRegistry holding the server's games
+        """
+        return self._registry
+
+    def get_moves(self):
+        """
+        Returns the number of move requests the server has answered
+        """
+        return self._moves
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+        Starts accepting connections
+        :param host: the address to listen on
+        :param port: the port to listen on - 0 picks a free one (see get_port)
+        :return: None
+        """
+        self._server = await asyncio.start_server(self.handle_connection, host, port)
+
+    def get_port(self):
+        """
+        Returns the port the server is listening on
+        """
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """
+        Serves connections until cancelled
+        :return: None
+        """
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """
+        Stops accepting connections and shuts the executor down
+        :return: None
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False)
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serves one connection until the client disconnects. Lines are read into a queue that holds at most
+        max_pending requests; once it is full, reading waits for a worker to take a request off it, so the operating
+        system's buffers fill up and the client's writes slow down. The workers take requests off the queue in order
+        and go straight for the game's lock, so requests for the same game keep their order.
+        :param reader: the connection's asyncio StreamReader
+        :param writer: the connection's asyncio StreamWriter
+        :return: None
+        """
+        queue = asyncio.Queue(self._max_pending)
+        workers = [asyncio.create_task(self.answer_requests(queue, writer))
+                   for _ in range(self._connection_workers)]
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                await queue.put(line)
+            await queue.join()
+        except ConnectionError:
+            pass
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            writer.close()
+
+    async def answer_requests(self, queue, writer):
+        """
+        Takes requests off a connection's queue and writes back the responses, until cancelled
+        :param queue: the connection's queue of request lines
+        :param writer: the connection's asyncio StreamWriter
+        :return: None
+        """
+        while True:
+            line = await queue.get()
+            try:
+                response = await self.answer(line)
+                writer.write(json.dumps(response, separators=(',', ':')).encode() + b'\n')
+                await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                queue.task_done()
+
+    async def answer(self, line):
+        """
+        Works out the response to one request
+        :param line: the request, as a line of JSON
+        :return: the response, as a dictionary
+        """
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                raise RequestError('request is not valid JSON')
+            if not isinstance(request, dict):
+                raise RequestError('request is not a JSON object')
+            request_id = request.get('id')
+            response = await self.carry_out(request)
+        except RequestError as error:
+            response = {'error': str(error)}
+        if request_id is not None:
+            response['id'] = request_id
+        return response
+
+    async def carry_out(self, request):
+        """
+        Carries out one request
+        :param request: the request, as a dictionary
+        :return: the response, as a dictionary
+        """
+        operation = request.get('op')
+        if operation == 'new':
+            return {'game': self._registry.create().get_game_id()}
+
+        session = self._registry.get(request.get('game'))
+        loop = asyncio.get_running_loop()
+        async with session.get_lock():
+            if session.is_closed():
+                raise RequestError('unknown game')
+            if operation == 'close':
+                self._registry.close(session)
+                return {'closed': True}
+            if operation == 'move':
+                start, end = request.get('start'), request.get('end')
+                if not isinstance(start, str) or not isinstance(end, str):
+                    raise RequestError('a move needs "start" and "end" tiles')
+                result = await loop.run_in_executor(self._executor, session.get_game().make_move, start, end)
+                self._moves += 1
+                response = session.describe()
+                response['result'] = result
+                return response
+            if operation == 'state':
+                return session.describe()
+            if operation == 'legal':
+                moves = await loop.run_in_executor(self._executor, session.get_game().legal_moves)
+                return {'moves': moves}
+        raise RequestError('unknown op')
+
+
+async def run_server(host=DEFAULT_HOST, port=DEFAULT_PORT, max_games=None, max_pending=DEFAULT_MAX_PENDING,
+                     ready=None):
+    """
+    Runs a GameServer until cancelled
+    :param host: the address to listen on
+    :param port: the port to listen on
+    :param max_games: the most games that may be open at once - by default, no limit
+    :param max_pending: the most requests from one connection that may be waiting to be handled
+    :param ready: optionally, a function to call with the port once the server is listening
+    :return: None
+    """
+    server = GameServer(GameRegistry(max_games), max_pending=max_pending)
+    await server.start(host, port)
+    if ready is not None:
+        ready(server.get_port())
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(arguments=None):
+    """
+    Runs the server from the command line
+    :param arguments: the command line arguments - by default, sys.argv
+    :return: the exit status
+    """
+    parser = argparse.ArgumentParser(description='Host Janggi games over TCP, one JSON request per line.')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='the address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='the port to listen on')
+    parser.add_argument('--max-games', type=int, default=None, help='the most games that may be open at once')
+    parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+                        help='the most requests from one connection that may wait to be handled')
+    options = parser.parse_args(arguments)
+    try:
+        asyncio.run(run_server(options.host, options.port, options.max_games, options.max_pending,
+                               ready=lambda port: print('serving on {}:{}'.format(options.host, port), flush=True)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,119 @@
+import io
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from JanggiGame import (GamePool, JanggiGame, disable_instrumentation, enable_instrumentation, read_records,
+                        read_text_records, replay_archive, replay_chunk, reset_instrumentation, write_records,
+                        write_text_records)
+
+
+class SeeTest(unittest.TestCase):
+    """
+    Tests for JanggiGame.see
+    """
+    def test_pass_scores_zero(self):
+        game = JanggiGame()
+        self.assertEqual(game.see('e9', 'e9'), 0)
+
+    def test_move_onto_own_piece_scores_zero(self):
+        game = JanggiGame()
+        position = game.get_board().get_position_bytes()
+        self.assertEqual(game.see('a1', 'a4'), 0)
+        self.assertEqual(game.get_board().get_position_bytes(), position)
+
+
+class RecordTest(unittest.TestCase):
+    """
+    Tests for the game-record files and replaying them
+    """
+    def setUp(self):
+        game = JanggiGame()
+        game.make_move('c7', 'c6')
+        self.position = game.encode_position()
+        self.games = [(None, [('c7', 'c6'), ('c4', 'c5')]), (self.position, [('c4', 'c5')]), (None, []),
+                      (self.position, [])]
+
+    def replay_file(self, data, binary):
+        handle, path = tempfile.mkstemp()
+        with os.fdopen(handle, 'wb' if binary else 'w') as records:
+            records.write(data)
+        try:
+            with ThreadPoolExecutor(1) as executor:
+                return replay_archive(path, chunk_size=2, executor=executor)
+        finally:
+            os.remove(path)
+
+    def test_blank_lines_are_skipped(self):
+        _, statistics, errors = replay_chunk(1, ['', 'c7-c6', '   ', '# comment'])
+        self.assertEqual(statistics['games'], 1)
+        self.assertEqual(errors, [])
+
+    def test_text_round_trip(self):
+        stream = io.StringIO()
+        write_text_records(stream, self.games)
+        self.assertNotIn('\n\n', stream.getvalue())
+        stream.seek(0)
+        self.assertEqual(list(read_text_records(stream)), self.games)
+
+    def test_replay_text_file_with_positions(self):
+        stream = io.StringIO()
+        write_text_records(stream, self.games)
+        statistics, errors = self.replay_file(stream.getvalue() + '\n', False)
+        self.assertEqual(errors, [])
+        self.assertEqual(statistics['games'], 4)
+        self.assertEqual(statistics['moves'], 3)
+
+    def test_replay_binary_file(self):
+        stream = io.BytesIO()
+        write_records(stream, self.games + [(None, [('c4', 'c5')])])
+        statistics, errors = self.replay_file(stream.getvalue(), True)
+        self.assertEqual(statistics['games'], 5)
+        self.assertEqual(statistics['illegal'], 1)
+        self.assertEqual(errors, [(5, 'move 1 (c4-c5) is illegal')])
+
+    def test_bad_position_is_unreadable(self):
+        bad_piece = self.position[:10] + bytes((8,)) + self.position[11:]
+        bad_turn = self.position[:90] + bytes((2,))
+        blue_general = self.position.index(1, 0, 90)
+        red_general = self.position.index(9, 0, 90)
+        no_red_general = self.position[:red_general] + bytes((0,)) + self.position[red_general + 1:]
+        two_blue_generals = self.position[:red_general] + bytes((1,)) + self.position[red_general + 1:]
+        two_red_generals = self.position[:blue_general] + bytes((9,)) + self.position[blue_general + 1:]
+        for position in (bad_piece, bad_turn, no_red_general, two_blue_generals, two_red_generals):
+            with self.assertRaisesRegex(ValueError, 'unreadable position'):
+                list(read_records(io.BytesIO(b'JGR1\x01' + position + b'\x00\x00')))
+            with self.assertRaisesRegex(ValueError, 'unreadable position'):
+                list(read_text_records(io.StringIO('position:' + position.hex() + '\n')))
+        _, statistics, errors = replay_chunk(1, ['position:zz c7-c6', 'position:' + no_red_general.hex() + ' c4-c5',
+                                                 'c7-c6'])
+        self.assertEqual(statistics['unreadable'], 2)
+        self.assertEqual(statistics['games'], 1)
+        self.assertEqual(errors, [(1, 'unreadable position'), (2, 'unreadable position')])
+
+
+class GamePoolTest(unittest.TestCase):
+    """
+    Tests for GamePool
+    """
+    def setUp(self):
+        enable_instrumentation()
+        self.addCleanup(reset_instrumentation)
+        self.addCleanup(disable_instrumentation)
+
+    def test_reused_game_starts_with_no_stats(self):
+        pool = GamePool()
+        game = pool.acquire()
+        game.make_move('c7', 'c6')
+        self.assertTrue(game.stats()['counters'])
+        pool.release(game)
+        reused = pool.acquire()
+        self.assertIs(reused, game)
+        self.assertEqual(reused.stats(), {'counters': {}, 'phases': {}})
+        reused.make_move('c7', 'c6')
+        self.assertEqual(reused.stats()['counters']['board_push'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
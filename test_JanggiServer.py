@@ -0,0 +1,31 @@
+import asyncio
+import unittest
+
+from JanggiServer import GameServer
+
+
+class GameServerTest(unittest.TestCase):
+    """
+    Tests for GameServer.answer
+    """
+    def answer(self, server, *requests):
+        async def run():
+            return [await server.answer(request) for request in requests]
+        return asyncio.run(run())
+
+    def test_non_integer_game_id_is_unknown(self):
+        server = GameServer()
+        try:
+            responses = self.answer(server, '{"op": "new"}', '{"op": "state", "game": true}',
+                                    '{"op": "state", "game": 1.0}', '{"op": "state", "game": "1"}',
+                                    '{"op": "state", "game": 1}')
+        finally:
+            asyncio.run(server.close())
+        self.assertEqual(responses[0], {'game': 1})
+        for response in responses[1:4]:
+            self.assertEqual(response, {'error': 'unknown game'})
+        self.assertEqual(responses[4]['state'], 'UNFINISHED')
+
+
+if __name__ == '__main__':
+    unittest.main()